@@ -0,0 +1,102 @@
+import numpy as np
+
+# Risk analytics shared by the API, the Streamlit app and the benchmarks.
+
+
+def calculate_risk_metrics(series, name):
+    if series is None or len(series) < 2:
+        return {"Name": name, "Volatility": np.nan, "Max Drawdown": np.nan}
+    daily_ret = series.pct_change().dropna()
+    volatility = daily_ret.std() * np.sqrt(252) * 100
+    cumulative = (1 + daily_ret).cumprod()
+    # The first close (1.0) counts as a peak too
+    peak = cumulative.cummax().clip(lower=1.0)
+    drawdown = (cumulative - peak) / peak
+    max_drawdown = drawdown.min() * 100
+    return {"Name": name, "Volatility (Ann.)": f"{volatility:.2f}%", "Max Drawdown": f"{max_drawdown:.2f}%"}
+
+
+TRADING_DAYS = 252
+ROLLING_WINDOWS = (30, 90, 252)
+
+
+def _rolling_std(returns, valid, window):
+    """Rolling sample std over `window` rows; NaN until a window holds only valid returns."""
+    zeros = np.zeros((1, returns.shape[1]))
+    s1 = np.vstack([zeros, np.cumsum(returns, axis=0)])
+    s2 = np.vstack([zeros, np.cumsum(returns ** 2, axis=0)])
+    n = np.vstack([zeros, np.cumsum(valid, axis=0)])
+
+    out = np.full(returns.shape, np.nan)
+    if len(returns) < window:
+        return out
+    w1 = s1[window:] - s1[:-window]
+    w2 = s2[window:] - s2[:-window]
+    count = n[window:] - n[:-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = (w2 - w1 ** 2 / window) / (window - 1)
+    out[window - 1:] = np.where(count == window, np.sqrt(np.maximum(var, 0)), np.nan)
+    return out
+
+
+def risk_matrix(prices, benchmark=None, windows=ROLLING_WINDOWS):
+    """Risk metrics for every column of a (dates x series) price matrix in one vectorized pass.
+
+    Gaps are forward filled, columns may start late (NaN before listing). Returns a dict of
+    arrays: volatility and max_drawdown in percent per column, beta against `benchmark`
+    (a price vector on the same dates), rolling annualized volatility per window and the
+    drawdown curve, both dates x series.
+    """
+    prices = np.asarray(prices, dtype=float)
+    # Forward fill along dates
+    rows = np.where(np.isnan(prices), 0, np.arange(len(prices))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    prices = prices[rows, np.arange(prices.shape[1])]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = prices[1:] / prices[:-1] - 1
+    valid = ~np.isnan(returns)
+    count = valid.sum(axis=0)
+    filled = np.where(valid, returns, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum(axis=0) / count
+        var = (np.where(valid, returns - mean, 0.0) ** 2).sum(axis=0) / (count - 1)
+        volatility = np.sqrt(var) * np.sqrt(TRADING_DAYS) * 100
+
+        peak = np.fmax.accumulate(prices, axis=0)
+        drawdown = prices / peak - 1
+    max_drawdown = np.min(drawdown, axis=0, initial=0, where=~np.isnan(drawdown)) * 100
+    max_drawdown[count == 0] = np.nan
+    # A sample std needs two returns (with none, 0 / (count - 1) would give -0.0)
+    volatility[count < 2] = np.nan
+
+    beta = np.full(prices.shape[1], np.nan)
+    if benchmark is not None:
+        bench = np.asarray(benchmark, dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bench_returns = bench[1:] / bench[:-1] - 1
+            pair = valid & ~np.isnan(bench_returns)[:, None]
+            n = pair.sum(axis=0)
+            b = np.where(pair, bench_returns[:, None], 0.0)
+            r = np.where(pair, returns, 0.0)
+            b_mean = b.sum(axis=0) / n
+            r_mean = r.sum(axis=0) / n
+            cov = (np.where(pair, (r - r_mean) * (b - b_mean), 0.0)).sum(axis=0) / (n - 1)
+            b_var = (np.where(pair, (b - b_mean) ** 2, 0.0)).sum(axis=0) / (n - 1)
+            beta = cov / b_var
+
+    rolling = {}
+    for window in windows:
+        rolling[window] = np.vstack([
+            np.full((1, prices.shape[1]), np.nan),
+            _rolling_std(filled, valid, window) * np.sqrt(TRADING_DAYS) * 100,
+        ])
+
+    return {
+        "volatility": volatility,
+        "max_drawdown": max_drawdown,
+        "beta": beta,
+        "rolling_volatility": rolling,
+        "drawdown": drawdown * 100,
+    }
@@ -1,9 +1,35 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 import pandas as pd
-import yfinance as yf
 import numpy as np
-from datetime import datetime, timedelta
+import os
+import io
+import gzip
+import json
+import time
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import metrics
+from price_matrix import PriceMatrix
+from row_buffer import RowBuffer
+from price_store import PriceStore
+from providers import get_provider
+from upstream import UpstreamClient, UpstreamUnavailable
+from scheduler import IST, LeaderLock, RefreshScheduler, SingleFlight
+from shared_cache import SharedCache
+from analytics import ROLLING_WINDOWS, risk_matrix
+from backtest import SCHEDULES, WEIGHTINGS, run_backtests, summarize
+from downsample import downsample_indices
+from intraday import RingBuffer
+from index_engine import DEFAULT_SHARES, IndexEngine, chain_levels, load_index_definitions, missing_shares
+
+try:
+    import brotli
+except ImportError: # optional, gzip is used when it is not installed
+    brotli = None
 
 app = Flask(__name__, static_folder='.', static_url_path='')
 CORS(app)
@@ -67,55 +93,847 @@ SHARES_DB = {
     "JUSTDIAL.NS": 84000000
 }
 
+# Free float as a fraction of shares outstanding, used by float-adjusted backtests.
+# Tickers without an entry count as fully floated.
+FLOAT_DB = {}
+
 STARTUP_TICKERS_FULL = list(TICKER_MAP.keys())
 BENCHMARK_TICKER = "^NSEI"
 
+# 3. LOCAL PRICE STORE
+# History is downloaded once from HISTORY_START, afterwards only the missing bars are fetched
+HISTORY_START = "2021-01-01"
+REFRESH_INTERVAL = 60 # seconds between upstream delta fetches
+UPSTREAM_WORKERS = 4 # concurrent upstream downloads
+UPSTREAM_TIMEOUT = 10 # seconds before a refresh gives up on slow downloads and serves stale data
+UPSTREAM_RATE = 5 # ticker requests per second, sustained
+UPSTREAM_BURST = 60 # ticker requests allowed at once (a cold start downloads every ticker)
+UPSTREAM_RETRIES = 3 # retries per call, exponential backoff with jitter
+CIRCUIT_THRESHOLD = 5 # consecutive failures before upstream calls stop
+CIRCUIT_RESET = 60 # seconds before a trial call after the circuit opened
+PRICE_STORE_DIR = os.environ.get("PRICE_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "prices"))
+# Upstream source is pluggable: PRICE_PROVIDER=replay serves synthetic/recorded bars offline.
+# Every call goes through a shared request budget and circuit breaker; while upstream is
+# unhealthy the stored bars are served marked stale.
+PROVIDER = UpstreamClient(get_provider(), rate=UPSTREAM_RATE, burst=UPSTREAM_BURST, retries=UPSTREAM_RETRIES,
+                          threshold=CIRCUIT_THRESHOLD, reset_timeout=CIRCUIT_RESET, acquire_timeout=UPSTREAM_TIMEOUT)
+PRICE_STORE = PriceStore(PRICE_STORE_DIR, HISTORY_START, refresh_interval=REFRESH_INTERVAL, provider=PROVIDER,
+                         workers=UPSTREAM_WORKERS, timeout=UPSTREAM_TIMEOUT)
+# Resident copy of the stored prices, once per store generation; the next generation only
+# converts the days that changed since
+_PRICE_MATRIX = (None, None)
+
+def get_price_matrix(view=None):
+    global _PRICE_MATRIX
+    frames, generation, changed_from = (view or PRICE_STORE.view())[:3]
+    key = (PRICE_STORE.path, generation)
+    if _PRICE_MATRIX[0] != key:
+        with metrics.stage("price_matrix"):
+            previous = _PRICE_MATRIX[1] if _PRICE_MATRIX[0] and _PRICE_MATRIX[0][0] == PRICE_STORE.path else None
+            if previous is None and SNAPSHOT is not None:
+                previous = SNAPSHOT['matrix']
+            matrix = None
+            if previous is not None and previous.generation == generation - 1 and changed_from is not None:
+                matrix = previous.extended(frames, generation, changed_from)
+            _PRICE_MATRIX = (key, matrix or PriceMatrix(frames, generation))
+    return _PRICE_MATRIX[1]
+
+# 4. INDEX DEFINITIONS
+# Every index is data: constituents, share counts, a base date and dated events. The startup
+# index is built from TICKER_MAP/SHARES_DB, thematic indices are added in indices.json.
+# Events change shares or membership from their date on, e.g.
+#   {"date": "2025-06-02", "shares": {"PAYTM.NS": 640000000, "SWIGGY.NS": 2200000000},
+#    "add": ["SWIGGY.NS"], "remove": ["YATRA.NS"]}
+# A ticker an event adds needs its share count in the event. Past index values are never
+# rewritten, the divisor absorbs the change.
+STARTUP_INDEX_EVENTS = []
+INDICES_FILE = os.environ.get("INDICES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "indices.json"))
+INDEX_DEFINITIONS = {
+    "startups": {
+        "name": "Startup Index",
+        "constituents": STARTUP_TICKERS_FULL,
+        "shares": {t: SHARES_DB.get(t, DEFAULT_SHARES) for t in STARTUP_TICKERS_FULL},
+        "base_date": HISTORY_START,
+        "events": STARTUP_INDEX_EVENTS,
+    },
+}
+# Without a share count an added ticker would silently get DEFAULT_SHARES
+if missing_shares(INDEX_DEFINITIONS["startups"]):
+    raise ValueError("STARTUP_INDEX_EVENTS adds tickers without share counts: %s"
+                     % ", ".join(missing_shares(INDEX_DEFINITIONS["startups"])))
+INDEX_DEFINITIONS.update(load_index_definitions(INDICES_FILE))
+INDEX_ENGINE = IndexEngine(INDEX_DEFINITIONS)
+
 def get_fundamental_data(tickers):
     # Instead of slow API calls, we return our robust local DB
     # We create a DataFrame to match the format expected by the logic
+    current = INDEX_ENGINE.members("startups")
     data = {}
     for ticker in tickers:
-        # Default to a median value if ticker missing from DB to prevent crashes
-        shares = SHARES_DB.get(ticker, 100000000) 
+        # Latest share count after events, default to a median value if ticker missing from DB to prevent crashes
+        shares = current.get(ticker, SHARES_DB.get(ticker, DEFAULT_SHARES))
         data[ticker] = {'shares': shares}
             
     df = pd.DataFrame.from_dict(data, orient='index')
     return df
 
-def calculate_weighted_index(tickers, start_date_str, end_date_str, shares_series):
-    if not tickers: return None
-    end_date_obj = datetime.strptime(end_date_str, "%Y-%m-%d") + timedelta(days=1)
-    
-    # Fetch price history
-    raw_data = yf.download(tickers, start=start_date_str, end=end_date_obj.strftime("%Y-%m-%d"), threads=False, auto_adjust=False, progress=False)
-    
-    if raw_data.empty: return None
+def get_index_state(previous=None, view=None):
+    """Levels of every configured index, one pass over the shared price matrix.
+
+    With the state built from the previous store generation only the days that changed
+    since are computed and appended.
+    """
+    frames, generation, changed_from, _ = view or PRICE_STORE.view()
+    if not frames: return None
+    field = 'Adj Close' if 'Adj Close' in frames else 'Close'
+    if previous is not None:
+        state, built_from = previous
+        if built_from == generation:
+            return previous
+        if built_from == generation - 1 and changed_from is not None:
+            return INDEX_ENGINE.update(state, frames[field].loc[changed_from:]), generation
+    return INDEX_ENGINE.build(frames[field]), generation
+
+# 5. BENCHMARK & COMPOSITION
+def get_benchmark_series(frames=None):
+    frames = PRICE_STORE.frames() if frames is None else frames
+    if not frames: return None
+
+    field = 'Adj Close' if 'Adj Close' in frames else 'Close'
+    if BENCHMARK_TICKER not in frames[field] or frames[field][BENCHMARK_TICKER].isna().all(): return None
+    return frames[field][BENCHMARK_TICKER].ffill().bfill()
+
+def calculate_composition(tickers, meta_df, matrix=None):
+    """Latest snapshot of all companies with real weights and 52-week range."""
+    matrix = get_price_matrix() if matrix is None else matrix
+    if not len(matrix): return []
+    columns, positions = matrix.positions(tickers)
+    if not columns: return []
+
+    # One year of stored bars, the same window fetch_rich_stats used for 52W high/low
+    last_date = matrix.dates[-1]
+    year = slice(matrix.row(last_date - timedelta(days=365)), None)
+
+    # Last real bar per column, skipping names that have not traded in the last 5 days
+    last_row = matrix.last_valid[positions]
+    keep = (last_row >= 0) & (matrix.dates[last_row] >= last_date - timedelta(days=5))
+    if not keep.any(): return []
+
+    cols = np.flatnonzero(keep)
+    price = matrix.prices[last_row[cols], positions[cols]]
+    highs = matrix.values.get('High', matrix.prices)[year, positions[cols]]
+    lows = matrix.values.get('Low', matrix.prices)[year, positions[cols]]
+    # High/Low are unadjusted, so the range is stretched to the last unadjusted close
+    close = matrix.values.get('Close', matrix.prices)[last_row[cols], positions[cols]]
+    high = np.fmax(np.max(highs, axis=0, initial=-np.inf, where=~np.isnan(highs)), close)
+    low = np.fmin(np.min(lows, axis=0, initial=np.inf, where=~np.isnan(lows)), close)
+
+    shares = meta_df['shares'].reindex([columns[i] for i in cols]).to_numpy(dtype=float)
+    mkt_cap = price * shares
+    weight = mkt_cap / mkt_cap.sum() * 100
+
+    composition_list = []
+    for i in np.argsort(-weight, kind='stable'):
+        ticker = columns[cols[i]]
+        details = TICKER_MAP.get(ticker, {"name": ticker, "sector": "Tech"})
+        composition_list.append({
+            "ticker": ticker.replace(".NS", "").replace(".BO", ""),
+            "name": details['name'],
+            "sector": details['sector'],
+            "price": round(float(price[i]), 2),
+            "mkt_cap": round(float(mkt_cap[i]) / 10000000), # In Crores
+            "weight": round(float(weight[i]), 2),
+            "high": round(float(high[i]), 2),
+            "low": round(float(low[i]), 2)
+        })
+    return composition_list
 
-    # Handle MultiIndex columns
-    if 'Adj Close' in raw_data.columns.levels[0]:
-        prices = raw_data['Adj Close']
-    elif 'Close' in raw_data.columns.levels[0]:
-        prices = raw_data['Close']
+def calculate_sectors(state, previous=None):
+    """Divisor-chained market-cap index and current weight per TICKER_MAP sector.
+
+    The per-ticker cap matrices are summed per sector in one matrix product with a
+    ticker x sector membership matrix, then every sector chains its own divisor. With
+    `previous` built from the state this one was updated from, only the revised and new
+    days are computed and written after its levels.
+    """
+    members = INDEX_ENGINE.constituents("startups")
+    sector_of = [TICKER_MAP.get(t, {"sector": "Tech"})['sector'] for t in members]
+    sectors = sorted(set(sector_of))
+    if previous is not None and previous['state'] == state.token:
+        return previous
+    start = 0
+    if previous is not None and previous['state'] == state.parent and previous['names'] == sectors:
+        start = state.revised_from
+    membership = np.zeros((len(sector_of), len(sectors)))
+    membership[np.arange(len(sector_of)), [sectors.index(sector) for sector in sector_of]] = 1.0
+
+    caps, carried = INDEX_ENGINE.constituent_market_caps(state, "startups", start)
+    sector_caps = caps.to_numpy() @ membership
+    levels = chain_levels(sector_caps, carried.to_numpy() @ membership,
+                          previous=previous['levels'][start - 1] if start else None)
+    # The levels stay unchanged while `state` is alive (see row_buffer.py)
+    if start:
+        buffer, slot = previous['buffer']
+        buffer, slot = buffer.write(state, slot, len(previous['levels']), start, levels)
     else:
-        # Fallback for single level or unexpected structure
-        prices = raw_data.iloc[:, :len(tickers)]
-    
-    prices = prices.dropna(axis=1, how='all').ffill().bfill()
-    if prices.empty: return None
+        buffer, slot = RowBuffer(levels), 0
+    latest = sector_caps[-1] if len(sector_caps) else np.zeros(len(sectors))
+    total = latest.sum()
+    return {
+        "names": sectors,
+        # dates x sectors, on the snapshot's price matrix calendar
+        "levels": buffer.attach(state, slot, state.n),
+        "buffer": (buffer, slot),
+        # token of the IndexState the levels were computed from
+        "state": state.token,
+        "weights": latest / total * 100 if total > 0 else np.zeros(len(sectors)),
+        "sizes": membership.sum(axis=0).astype(int),
+    }
 
-    # Align shares with price columns
-    common = prices.columns.intersection(shares_series.index)
-    prices = prices[common]
-    current_shares = shares_series[common]
-    
-    market_caps = prices.mul(current_shares, axis=1)
-    total_market_cap = market_caps.sum(axis=1)
-    
-    if total_market_cap.empty or total_market_cap.iloc[0] == 0: return None
-    
-    index_series = (total_market_cap / total_market_cap.iloc[0]) * 100
-    index_series.index = index_series.index.strftime('%Y-%m-%d')
-    return index_series.to_dict()
+# 6. SNAPSHOTS
+# A background scheduler rebuilds everything the routes serve; routes only read the
+# latest snapshot. Misses are coalesced so concurrent requests share one computation.
+# Under gunicorn every worker runs this module: the worker holding LEADER refreshes from
+# upstream and publishes its status, the others rebuild when the store on disk changes
+# and share encoded bodies and the intraday session through SHARED_CACHE.
+# The latest snapshot is also written to WARM_START_FILE, so a new worker serves its first
+# request from it without touching upstream or recomputing.
+SNAPSHOT_VERSION = 3 # bump when the snapshot layout changes, older warm starts are ignored
+BACKGROUND_REFRESH = os.environ.get("BACKGROUND_REFRESH", "1") != "0"
+WARM_START_FILE = os.path.join(PRICE_STORE_DIR, "snapshot.pkl")
+SNAPSHOT = None
+SNAPSHOT_UPDATED = threading.Condition()
+SINGLE_FLIGHT = SingleFlight()
+SHARED_CACHE = SharedCache(os.environ.get("SHARED_CACHE_PATH", os.path.join(PRICE_STORE_DIR, "shared.sqlite")))
+LEADER = LeaderLock(os.path.join(PRICE_STORE_DIR, "leader.lock"))
+
+def store_stale():
+    if not LEADER.follower:
+        return PRICE_STORE.stale
+    status = SHARED_CACHE.get("store_status")
+    return bool(status and json.loads(status)['stale'])
+
+def build_snapshot(refresh=True):
+    tickers = STARTUP_TICKERS_FULL
+    # The union of all index constituents is downloaded once
+    with metrics.stage("store_ensure"):
+        # Followers leave re-fetching the latest bars to the leader
+        PRICE_STORE.ensure(INDEX_ENGINE.universe + [BENCHMARK_TICKER], HISTORY_START, datetime.today(),
+                           refresh=refresh and not LEADER.follower)
+    meta_df = get_fundamental_data(tickers)
+    # Every field comes from one generation: a concurrent save (e.g. a history extension
+    # prepending rows) must not mix row layouts between the index state and the matrix
+    view = PRICE_STORE.view()
+    frames, generation, _, saved_at = view
+    matrix = get_price_matrix(view)
+    with metrics.stage("index_state"):
+        index_state = get_index_state(SNAPSHOT['index_state'] if SNAPSHOT else None, view)
+    with metrics.stage("composition"):
+        composition = calculate_composition(tickers, meta_df, matrix)
+    with metrics.stage("sectors"):
+        previous = SNAPSHOT['sectors'] if SNAPSHOT else None
+        sectors = calculate_sectors(index_state[0], previous) if index_state else None
+    return {
+        "version": SNAPSHOT_VERSION,
+        "built_at": time.time(),
+        "generation": generation,
+        "stale": store_stale(),
+        "modified_at": saved_at,
+        # (IndexState, store generation it was built from)
+        "index_state": index_state,
+        "nifty": get_benchmark_series(frames),
+        "matrix": matrix,
+        "composition": composition,
+        "sectors": sectors,
+    }
+
+def save_warm_start(snapshot):
+    tmp = WARM_START_FILE + ".tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, WARM_START_FILE)
+    except OSError:
+        app.logger.warning("Could not write %s", WARM_START_FILE)
+
+def load_warm_start():
+    """The last saved snapshot if it was built from the generation currently on disk."""
+    try:
+        with open(WARM_START_FILE, 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    PRICE_STORE.frames()
+    if snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('generation') != PRICE_STORE.generation \
+            or PRICE_STORE.changed_on_disk():
+        return None
+    return snapshot
+
+def refresh_snapshot(refresh=True):
+    global SNAPSHOT
+    snapshot = build_snapshot(refresh)
+    # A save that landed during the build (e.g. a history extension) gets its own rebuild
+    for _ in range(2):
+        if snapshot['generation'] == PRICE_STORE.generation: break
+        snapshot = build_snapshot(refresh=False)
+    # Never replace a snapshot with one built from an older store generation
+    with SNAPSHOT_UPDATED:
+        previous = SNAPSHOT
+        if SNAPSHOT is None or snapshot['generation'] >= SNAPSHOT['generation']:
+            SNAPSHOT = snapshot
+            SNAPSHOT_UPDATED.notify_all()
+        latest = SNAPSHOT
+    if latest is snapshot and not LEADER.follower and (previous is None or previous['generation'] != snapshot['generation']):
+        save_warm_start(snapshot)
+    return latest
+
+def first_snapshot():
+    global SNAPSHOT
+    snapshot = load_warm_start()
+    if snapshot is None:
+        # Without a background thread the request path is the only place that refreshes
+        return refresh_snapshot(refresh=not BACKGROUND_REFRESH)
+    with SNAPSHOT_UPDATED:
+        if SNAPSHOT is None:
+            SNAPSHOT = snapshot
+        return SNAPSHOT
+
+def extend_history(start_date_str):
+    PRICE_STORE.ensure(INDEX_ENGINE.universe + [BENCHMARK_TICKER], start_date_str, datetime.today(), refresh=not BACKGROUND_REFRESH)
+    return refresh_snapshot(refresh=not BACKGROUND_REFRESH)
+
+def get_snapshot(start_date_str=None):
+    if start_date_str and PRICE_STORE.covered_from is not None and pd.Timestamp(start_date_str) < PRICE_STORE.covered_from:
+        return SINGLE_FLIGHT.do(('extend', start_date_str), lambda: extend_history(start_date_str))
+    if SNAPSHOT is None:
+        return SINGLE_FLIGHT.do('refresh', first_snapshot)
+    # Another worker may have saved newer bars (a cheap stat of the manifest)
+    if PRICE_STORE.changed_on_disk():
+        return SINGLE_FLIGHT.do('refresh', lambda: refresh_snapshot(refresh=False))
+    return SNAPSHOT
+
+def background_refresh():
+    if LEADER.acquire():
+        SINGLE_FLIGHT.do('refresh', refresh_snapshot)
+        SHARED_CACHE.set("store_status", json.dumps({"stale": PRICE_STORE.stale, "refreshed_at": PRICE_STORE.last_refresh}).encode())
+    elif SNAPSHOT is None or PRICE_STORE.changed_on_disk() or SNAPSHOT['stale'] != store_stale():
+        SINGLE_FLIGHT.do('refresh', refresh_snapshot)
+
+SCHEDULER = RefreshScheduler(background_refresh, open_interval=REFRESH_INTERVAL)
+
+if BACKGROUND_REFRESH:
+    # Loaded at import, so with gunicorn --preload every forked worker starts with it
+    SNAPSHOT = load_warm_start()
+
+@app.before_request
+def start_background_refresh():
+    # Started lazily so importing the module (benchmarks, tools) never touches the network
+    if BACKGROUND_REFRESH:
+        SCHEDULER.start()
+        INTRADAY_SCHEDULER.start()
+
+@app.before_request
+def start_request_timer():
+    g.started = time.perf_counter()
+    # X-Profile: 1 returns per-stage timings of this request in a Server-Timing header
+    if request.headers.get('X-Profile'):
+        metrics.start_profile()
+
+@app.after_request
+def record_request_metrics(response):
+    elapsed = time.perf_counter() - g.get('started', time.perf_counter())
+    endpoint = request.endpoint or 'unknown'
+    metrics.REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, status=response.status_code)
+    if not response.is_streamed:
+        metrics.RESPONSE_BYTES.observe(response.calculate_content_length() or 0, endpoint=endpoint)
+    timing = metrics.end_profile()
+    if timing is not None:
+        response.headers['Server-Timing'] = (timing + ", " if timing else "") + "total;dur=%.2f" % (elapsed * 1000)
+    return response
+
+# 7. LIVE STREAM
+# Every open stream holds one gthread thread, so only STREAM_LIMIT of them run per worker
+# process (keep it below gunicorn's --threads); further tabs get a 503 and poll instead.
+STREAM_HEARTBEAT = 15 # seconds between keep-alive comments
+STREAM_LIMIT = int(os.environ.get("STREAM_LIMIT", "8")) # concurrent streams per worker, half of the Procfile's 16 threads
+STREAM_SLOTS = threading.BoundedSemaphore(STREAM_LIMIT)
+
+def index_points(snapshot, start_date_str, since=None, end_date_str=None, index_id="startups", key="startup_index", levels=None,
+                 max_points=None):
+    """Chart points rebased at start_date, optionally only from `since` onwards and
+    downsampled to at most `max_points`. `levels` overrides the index's own levels."""
+    matrix = snapshot['matrix']
+    if levels is None:
+        state = snapshot['index_state'][0] if snapshot['index_state'] else None
+        if state is None or index_id not in state.ids: return None
+        levels = state.levels[:, state.ids.index(index_id)]
+    lo, hi = matrix.window(start_date_str, end_date_str)
+    if hi == lo or levels[lo] == 0: return None
+    rows = slice(max(lo, matrix.row(since)) if since else lo, hi)
+
+    with metrics.stage("rebase"):
+        startup_index = levels[rows] / levels[lo] * 100
+        nifty_index = np.full(len(startup_index), np.nan)
+        if snapshot['nifty'] is not None:
+            nifty = snapshot['nifty'].to_numpy()
+            if nifty[lo] != 0:
+                nifty_index = nifty[rows] / nifty[lo] * 100
+    dates = matrix.labels[rows]
+
+    if max_points and len(startup_index) > max_points:
+        with metrics.stage("downsample"):
+            keep = downsample_indices([startup_index, nifty_index], max_points)
+            startup_index, nifty_index, dates = startup_index[keep], nifty_index[keep], dates[keep]
+
+    return {
+        "dates": dates.tolist(),
+        key: startup_index.tolist(),
+        "nifty_index": [None if np.isnan(v) else v for v in nifty_index.tolist()],
+    }
+
+def sse_event(event, data):
+    return "event: %s\ndata: %s\n\n" % (event, json.dumps(data))
+
+def stream_events(start_date_str, max_points=None):
+    """Full series (downsampled to at most `max_points`) and composition once, then only
+    new or revised points and changed rows."""
+    snapshot = get_snapshot(start_date_str)
+    points = index_points(snapshot, start_date_str, max_points=max_points)
+    yield "retry: 5000\n\n"
+    yield sse_event("snapshot", dict(points or {"dates": [], "startup_index": [], "nifty_index": []}, stale=snapshot['stale']))
+    yield sse_event("composition", snapshot['composition'])
+
+    last_point = (points['dates'][-1], points['startup_index'][-1]) if points and points['dates'] else None
+    rows = {row['ticker']: row for row in snapshot['composition']}
+    while True:
+        with SNAPSHOT_UPDATED:
+            SNAPSHOT_UPDATED.wait_for(lambda: SNAPSHOT is not snapshot, timeout=STREAM_HEARTBEAT)
+            latest = SNAPSHOT
+        if latest is snapshot:
+            yield ": keep-alive\n\n"
+            continue
+        snapshot = latest
+
+        # Resend from the last date the client has, its bar may have been revised
+        points = index_points(snapshot, start_date_str, since=last_point[0] if last_point else None)
+        if points and points['dates'] and (points['dates'][-1], points['startup_index'][-1]) != last_point:
+            yield sse_event("points", dict(points, stale=snapshot['stale']))
+            last_point = (points['dates'][-1], points['startup_index'][-1])
+
+        changed = [row for row in snapshot['composition'] if rows.get(row['ticker']) != row]
+        if changed:
+            yield sse_event("composition", changed)
+            rows = {row['ticker']: row for row in snapshot['composition']}
+
+# 8. HTTP CACHING & ENCODING
+# Responses carry an ETag derived from the store generation, so unchanged polls get a 304
+# without re-serializing. Encoded bodies are kept per ETag and encoding.
+MIN_COMPRESS_SIZE = 1024 # bytes
+BODY_CACHE_SIZE = 64
+_BODY_CACHE = OrderedDict()
+_BODY_CACHE_LOCK = threading.Lock()
+
+def pick_encoding():
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def encode_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+def compact_chart(points, stale):
+    """Binary chart encoding, all little-endian:
+
+    b'IDX1', uint8 stale flag, uint32 n, int32 first date (days since 1970-01-01),
+    then n-1 uint16 day deltas, n float32 startup values, n float32 nifty values (NaN = missing).
+    """
+    days = pd.DatetimeIndex(points['dates']).values.astype('datetime64[D]').astype(np.int64)
+    nifty = [np.nan if v is None else v for v in points['nifty_index']]
+    buffer = io.BytesIO()
+    buffer.write(b'IDX1')
+    buffer.write(np.array([int(stale)], dtype='<u1').tobytes())
+    buffer.write(np.array([len(days)], dtype='<u4').tobytes())
+    buffer.write(np.array([days[0] if len(days) else 0], dtype='<i4').tobytes())
+    buffer.write(np.diff(days).astype('<u2').tobytes())
+    buffer.write(np.asarray(points['startup_index'], dtype='<f4').tobytes())
+    buffer.write(np.asarray(nifty, dtype='<f4').tobytes())
+    return buffer.getvalue()
+
+def cached_response(snapshot, key, build, mimetype='application/json', shared=True):
+    """Conditional, compressed response for data derived from `snapshot`.
+
+    `build` returns the body bytes (None for a 404) and only runs when the client's
+    validators do not match and no encoded copy is cached yet, in this process or (with
+    `shared`) by another worker.
+    """
+    etag = hashlib.sha1(("%s|%s|%s" % (snapshot['generation'], snapshot['stale'], key)).encode()).hexdigest()[:20]
+    modified = datetime.fromtimestamp(int(snapshot['modified_at']), timezone.utc)
+
+    not_modified = request.if_none_match.contains_weak(etag) or (
+        not request.if_none_match and request.if_modified_since is not None and request.if_modified_since >= modified)
+    if not_modified:
+        response = Response(status=304)
+    else:
+        encoding = pick_encoding()
+        cache_key = (etag, encoding)
+        with _BODY_CACHE_LOCK:
+            body = _BODY_CACHE.get(cache_key)
+            if body is not None:
+                _BODY_CACHE.move_to_end(cache_key)
+        metrics.cache_lookup("body", body is not None)
+        shared_key = "body:%s:%s" % (etag, encoding)
+        if body is None and shared:
+            stored = SHARED_CACHE.get(shared_key)
+            metrics.cache_lookup("shared_body", stored is not None)
+            if stored is not None:
+                # Stored as b"<content encoding>\n<body>"
+                stored_encoding, stored_body = stored.split(b"\n", 1)
+                body = (stored_body, stored_encoding.decode() or None)
+                with _BODY_CACHE_LOCK:
+                    _BODY_CACHE[cache_key] = body
+        if body is None:
+            with metrics.stage("build"):
+                body = build()
+            if body is None and snapshot['stale'] and snapshot.get('index_state') is None:
+                # Nothing stored yet and upstream is failing: tell clients when to come back
+                response = jsonify({"error": "Upstream unavailable", "stale": True})
+                response.headers['Retry-After'] = str(PROVIDER.breaker.retry_after or REFRESH_INTERVAL)
+                return response, 503
+            if body is None: return jsonify({"error": "No data found"}), 404
+            if encoding and len(body) < MIN_COMPRESS_SIZE:
+                encoding = None
+            with metrics.stage("encode"):
+                body = encode_body(body, encoding)
+            with _BODY_CACHE_LOCK:
+                _BODY_CACHE[cache_key] = (body, encoding)
+                while len(_BODY_CACHE) > BODY_CACHE_SIZE:
+                    _BODY_CACHE.popitem(last=False)
+            if shared:
+                SHARED_CACHE.set(shared_key, (encoding or "").encode() + b"\n" + body)
+        else:
+            body, encoding = body
+        response = Response(body, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag, weak=True)
+    response.last_modified = modified
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+# 9. CUSTOM SUBSETS
+# What-if indices (?exclude= / ?include=) are answered from the per-ticker market cap
+# matrices: drop the excluded columns' contribution, chain the divisor again and rebase.
+# Results are memoized per store generation and subset with LRU eviction.
+SUBSET_CACHE_SIZE = 256
+_SUBSET_CACHE = OrderedDict()
+_SUBSET_CACHE_LOCK = threading.Lock()
+_SHORT_TICKERS = {t.replace(".NS", "").replace(".BO", ""): t for t in STARTUP_TICKERS_FULL}
+
+def parse_tickers(param):
+    """Comma separated tickers, with or without the exchange suffix, mapped to TICKER_MAP keys."""
+    tickers, unknown = set(), []
+    for raw in filter(None, (t.strip().upper() for t in param.split(','))):
+        ticker = raw if raw in TICKER_MAP else _SHORT_TICKERS.get(raw)
+        if ticker is None: unknown.append(raw)
+        else: tickers.add(ticker)
+    return frozenset(tickers), unknown
+
+def subset_market_cap(snapshot, excluded):
+    if snapshot['index_state'] is None: return None
+    state = snapshot['index_state'][0]
+
+    key = (snapshot['generation'], excluded)
+    with _SUBSET_CACHE_LOCK:
+        hit = key in _SUBSET_CACHE
+        if hit:
+            _SUBSET_CACHE.move_to_end(key)
+            series = _SUBSET_CACHE[key]
+    metrics.cache_lookup("subset", hit)
+    if hit: return series
+
+    caps, carried = INDEX_ENGINE.constituent_market_caps(state, "startups")
+    dropped = [caps.columns.get_loc(t) for t in caps.columns if t in excluded]
+    kept = [caps.columns.get_loc(t) for t in caps.columns if t not in excluded]
+    # Touch whichever side of the split has fewer columns
+    if len(dropped) < len(kept):
+        total, total_carried = state.totals("startups")
+        total = total - caps.to_numpy()[:, dropped].sum(axis=1)
+        total_carried = total_carried - carried.to_numpy()[:, dropped].sum(axis=1)
+    else:
+        total = caps.to_numpy()[:, kept].sum(axis=1)
+        total_carried = carried.to_numpy()[:, kept].sum(axis=1)
+    series = chain_levels(total[:, None], total_carried[:, None])[:, 0]
+
+    with _SUBSET_CACHE_LOCK:
+        _SUBSET_CACHE[key] = series
+        while len(_SUBSET_CACHE) > SUBSET_CACHE_SIZE:
+            _SUBSET_CACHE.popitem(last=False)
+    return series
+
+# 10. RISK ANALYTICS
+def _round_list(values, digits=4):
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+def calculate_risk(snapshot, start_date_str, end_date_str, all_curves=False):
+    """Volatility, drawdown, rolling volatility and beta for the index, NIFTY and every
+    constituent in one pass over the return matrix."""
+    prices = snapshot['matrix']
+    if snapshot['index_state'] is None or not len(prices): return None
+    state = snapshot['index_state'][0]
+
+    lo, hi = prices.window(start_date_str, end_date_str)
+    columns, positions = prices.positions(STARTUP_TICKERS_FULL)
+    if hi == lo: return None
+
+    matrix = np.column_stack([
+        state.levels[lo:hi, state.ids.index("startups")],
+        snapshot['nifty'].to_numpy()[lo:hi] if snapshot['nifty'] is not None else np.full(hi - lo, np.nan),
+        prices.prices[lo:hi, positions],
+    ])
+    names = ["Startup Index", "NIFTY 50"] + [t.replace(".NS", "").replace(".BO", "") for t in columns]
+    risk = risk_matrix(matrix, benchmark=matrix[:, 1])
+
+    series = {}
+    for i, name in enumerate(names):
+        row = {
+            "volatility": _round_list([risk['volatility'][i]], 2)[0],
+            "max_drawdown": _round_list([risk['max_drawdown'][i]], 2)[0],
+            "beta": _round_list([risk['beta'][i]], 3)[0],
+        }
+        # Curves for the index and the benchmark, constituents only on request
+        if i < 2 or all_curves:
+            row["rolling_volatility"] = {str(w): _round_list(risk['rolling_volatility'][w][:, i], 2) for w in ROLLING_WINDOWS}
+            row["drawdown"] = _round_list(risk['drawdown'][:, i], 2)
+        series[name] = row
+
+    return {"dates": prices.labels[lo:hi].tolist(), "series": series, "stale": snapshot['stale']}
+
+# 11. INTRADAY
+# Minute bars of the basket and NIFTY are turned into index values relative to the previous
+# close (= 100) and kept in a fixed-size ring buffer for the current session. Requests read
+# straight from memory; a second scheduler polls upstream while the market is open.
+INTRADAY_INTERVAL = 60 # seconds between minute-bar polls
+INTRADAY_CAPACITY = 512 # rows, a full session has 375 minutes
+INTRADAY_BUFFER = RingBuffer(INTRADAY_CAPACITY, width=2)
+INTRADAY_STALE = False # last poll failed, the buffer holds the last good minutes
+
+def intraday_values(closes, snapshot, session):
+    """(startup, nifty) values per minute, 100 = previous session's close."""
+    state = snapshot['index_state'][0] if snapshot['index_state'] else None
+    if state is None: return None
+    before = int(state.dates.searchsorted(pd.Timestamp(session))) - 1
+    if before < 0: return None
+
+    members = INDEX_ENGINE.members("startups", session)
+    tickers = list(members)
+    previous = state.prices[before, [INDEX_ENGINE.universe.index(t) for t in tickers]]
+    shares = np.where(np.isnan(previous), 0.0, np.array([members[t] for t in tickers]))
+    # Names without a minute bar yet count at the previous close
+    prices = closes.reindex(columns=tickers).ffill().to_numpy(dtype=float)
+    prices = np.where(np.isnan(prices), previous, prices)
+    carried = np.nansum(previous * shares)
+    startup = np.nan_to_num(prices) @ shares / carried * 100 if carried > 0 else np.full(len(closes), np.nan)
+
+    nifty = np.full(len(closes), np.nan)
+    if snapshot['nifty'] is not None and BENCHMARK_TICKER in closes:
+        nifty_close = snapshot['nifty'].loc[:pd.Timestamp(session) - timedelta(days=1)]
+        if not nifty_close.empty and nifty_close.iloc[-1] != 0:
+            nifty = closes[BENCHMARK_TICKER].ffill().to_numpy(dtype=float) / nifty_close.iloc[-1] * 100
+    return np.column_stack([startup, nifty])
+
+def poll_intraday():
+    global INTRADAY_STALE
+    tickers = list(INDEX_ENGINE.members("startups")) + [BENCHMARK_TICKER]
+    labels = {"provider": PROVIDER.name, "kind": "intraday"}
+    try:
+        with metrics.UPSTREAM_SECONDS.time(**labels):
+            closes = PROVIDER.intraday(tickers)
+    except Exception as e:
+        INTRADAY_STALE = True
+        metrics.UPSTREAM_CALLS.inc(outcome="rejected" if isinstance(e, UpstreamUnavailable) else "error", **labels)
+        raise
+    INTRADAY_STALE = False
+    metrics.UPSTREAM_CALLS.inc(outcome="ok", **labels)
+    if closes.empty: return
+    session = datetime.fromtimestamp(int(closes.index[0]), IST).strftime('%Y-%m-%d')
+    if INTRADAY_BUFFER.session != session:
+        INTRADAY_BUFFER.reset(session)
+
+    # Only minutes from the last buffered one on, it may have been a partial bar
+    last = INTRADAY_BUFFER.last_time
+    values = intraday_values(closes, get_snapshot(), session)
+    if values is None: return
+    for timestamp, row in zip(closes.index, values):
+        if last is None or timestamp >= last:
+            INTRADAY_BUFFER.append(int(timestamp), row)
+
+def publish_intraday():
+    _, times, values = INTRADAY_BUFFER.read()
+    SHARED_CACHE.set("intraday", json.dumps({
+        "session": INTRADAY_BUFFER.session, "stale": INTRADAY_STALE,
+        "times": times.tolist(), "values": values.tolist(),
+    }).encode())
+
+def sync_intraday():
+    """Followers copy the leader's session instead of polling upstream themselves."""
+    global INTRADAY_STALE
+    stored = SHARED_CACHE.get("intraday")
+    if stored is None: return
+    shared = json.loads(stored)
+    INTRADAY_STALE = shared['stale']
+    _, times, values = INTRADAY_BUFFER.read()
+    if shared['session'] == INTRADAY_BUFFER.session and len(shared['times']) == len(times) and (
+            not len(times) or np.allclose(shared['values'][-1], values[-1], equal_nan=True)):
+        return
+    INTRADAY_BUFFER.reset(shared['session'])
+    for timestamp, row in zip(shared['times'], shared['values']):
+        INTRADAY_BUFFER.append(timestamp, row)
+
+def intraday_job():
+    if LEADER.acquire():
+        try:
+            poll_intraday()
+        finally:
+            publish_intraday()
+    else:
+        sync_intraday()
+
+INTRADAY_SCHEDULER = RefreshScheduler(lambda: SINGLE_FLIGHT.do('intraday', intraday_job), open_interval=INTRADAY_INTERVAL)
+
+def intraday_points(since=None):
+    version, times, values = INTRADAY_BUFFER.read(since)
+    labels = pd.to_datetime(times, unit='s', utc=True).tz_convert('Asia/Kolkata').strftime('%H:%M')
+    return {
+        "session": INTRADAY_BUFFER.session,
+        "times": times.tolist(),
+        "labels": list(labels),
+        "startup_index": _round_list(values[:, 0]),
+        "nifty_index": _round_list(values[:, 1]),
+        "stale": INTRADAY_STALE,
+    }
+
+# 12. DOWNSAMPLING
+# Long ranges can be reduced on the server with ?points=N (or ?width=<chart pixels>, one
+# point per pixel). Results go through the body cache like any other response.
+MIN_POINTS = 3
+MAX_POINTS = 5000
+
+def requested_points():
+    """(points or None, error message or None) from the points/width query parameters."""
+    value = request.args.get('points') or request.args.get('width')
+    if value is None: return None, None
+    try:
+        points = int(value)
+    except ValueError:
+        return None, "points must be an integer"
+    if points < MIN_POINTS:
+        return None, "points must be at least %d" % MIN_POINTS
+    return min(points, MAX_POINTS), None
+
+# 13. SECTORS
+def sector_points(snapshot, start_date_str, end_date_str, max_points=None):
+    """Every sector's series rebased to 100 at its first level in the window, plus weights."""
+    sectors = snapshot['sectors']
+    if sectors is None: return None
+    lo, hi = snapshot['matrix'].window(start_date_str, end_date_str)
+    if hi == lo: return None
+
+    with metrics.stage("rebase"):
+        values = sectors['levels'][lo:hi].copy()
+        values[values <= 0] = np.nan
+        # Sectors that list after the start date are rebased on their first day
+        first = np.argmax(~np.isnan(values), axis=0)
+        rebased = values / values[first, np.arange(values.shape[1])] * 100
+    dates = snapshot['matrix'].labels[lo:hi]
+    if max_points and len(dates) > max_points:
+        with metrics.stage("downsample"):
+            rows = downsample_indices(list(rebased.T), max_points)
+            rebased, dates = rebased[rows], dates[rows]
+
+    return {
+        "dates": dates.tolist(),
+        "sectors": [{
+            "sector": sectors['names'][j],
+            "weight": round(float(sectors['weights'][j]), 2),
+            "constituents": int(sectors['sizes'][j]),
+            "index": _round_list(rebased[:, j], 2),
+        } for j in np.argsort(-sectors['weights'], kind='stable')],
+    }
+
+# 14. BACKTESTS
+# Equal, market-cap and float-adjusted weighting with optional single-name caps and
+# monthly/quarterly rebalancing, evaluated as a grid over the startup index's price and
+# market cap matrices. Each configuration's result is memoized per store generation and
+# window, so a grid only computes the configurations it has not seen yet.
+BACKTEST_CACHE_SIZE = 1024
+BACKTEST_MAX_CONFIGS = 200
+_BACKTEST_CACHE = OrderedDict()
+_BACKTEST_CACHE_LOCK = threading.Lock()
+
+def backtest_grid():
+    """(configs, error) from the weighting/cap/rebalance query parameters, all combinations."""
+    weightings = request.args.get('weighting', 'market,equal').split(',')
+    schedules = request.args.get('rebalance', 'quarterly').split(',')
+    unknown = [w for w in weightings if w not in WEIGHTINGS] + [r for r in schedules if r not in SCHEDULES]
+    if unknown: return None, "Unknown weighting or rebalance: " + ", ".join(unknown)
+    # Without free-float factors float weighting would silently equal market weighting
+    if 'float' in weightings and not FLOAT_DB: return None, "weighting=float needs free-float factors in FLOAT_DB"
+    caps = []
+    for raw in request.args.get('cap', 'none').split(','):
+        try:
+            cap = None if raw in ('', 'none') else float(raw)
+        except ValueError:
+            return None, "cap must be a fraction like 0.1 or none"
+        if cap is not None and not 0 < cap <= 1: return None, "cap must be in (0, 1]"
+        caps.append(None if cap == 1 else cap)
+
+    configs = [{"weighting": w, "cap": c, "rebalance": r}
+               for w in dict.fromkeys(weightings) for c in dict.fromkeys(caps) for r in dict.fromkeys(schedules)]
+    if len(configs) > BACKTEST_MAX_CONFIGS: return None, "At most %d configurations per request" % BACKTEST_MAX_CONFIGS
+    return configs, None
+
+def run_backtest_grid(snapshot, start_date_str, end_date_str, configs):
+    """(rows of the window, [result per config]); results hold the level array and summary statistics."""
+    if snapshot['index_state'] is None: return None, None
+    state = snapshot['index_state'][0]
+    lo, hi = snapshot['matrix'].window(start_date_str, end_date_str)
+    if hi - lo < 2: return None, None
+    window = slice(lo, hi)
+    dates = snapshot['matrix'].dates[window]
+
+    keys = [(snapshot['generation'], start_date_str, end_date_str, c['weighting'], c['cap'], c['rebalance']) for c in configs]
+    with _BACKTEST_CACHE_LOCK:
+        results = [_BACKTEST_CACHE.get(key) for key in keys]
+        for key, result in zip(keys, results):
+            if result is not None: _BACKTEST_CACHE.move_to_end(key)
+    missing = [i for i, result in enumerate(results) if result is None]
+    for result in results:
+        metrics.cache_lookup("backtest", result is not None)
+    if not missing: return window, results
+
+    with metrics.stage("backtest"):
+        caps, _ = INDEX_ENGINE.constituent_market_caps(state, "startups")
+        prices = state.prices[lo:hi, [INDEX_ENGINE.universe.index(t) for t in caps.columns]]
+        float_factors = np.array([FLOAT_DB.get(t, 1.0) for t in caps.columns])
+        levels, turnover = run_backtests(dates, prices, caps.to_numpy()[lo:hi], [configs[i] for i in missing], float_factors)
+        benchmark = snapshot['nifty'].to_numpy()[window] if snapshot['nifty'] is not None else None
+        stats = summarize(dates, levels, benchmark)
+
+    with _BACKTEST_CACHE_LOCK:
+        for k, i in enumerate(missing):
+            results[i] = {"levels": levels[:, k], "turnover": turnover[k] * 100, **{name: values[k] for name, values in stats.items()}}
+            _BACKTEST_CACHE[keys[i]] = results[i]
+        while len(_BACKTEST_CACHE) > BACKTEST_CACHE_SIZE:
+            _BACKTEST_CACHE.popitem(last=False)
+    return window, results
 
 # --- ROUTES ---
 
@@ -128,104 +946,177 @@ def startup_chart_data():
     start_date = request.args.get('start', '2026-01-01')
     end_date = request.args.get('end', datetime.today().strftime('%Y-%m-%d'))
     
-    meta_df = get_fundamental_data(STARTUP_TICKERS_FULL)
-    startup_data = calculate_weighted_index(STARTUP_TICKERS_FULL, start_date, end_date, meta_df['shares'])
-    
-    # NIFTY Benchmark
-    end_date_obj = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
-    nifty_raw = yf.download(BENCHMARK_TICKER, start=start_date, end=end_date_obj.strftime("%Y-%m-%d"), progress=False)
+    compact = request.args.get('format') == 'compact'
+    points_limit, error = requested_points()
+    if error: return jsonify({"error": error}), 400
+
+    # Optional what-if subset of the basket
+    excluded = frozenset()
+    if 'exclude' in request.args and 'include' in request.args:
+        return jsonify({"error": "Use either exclude or include, not both"}), 400
+    if 'exclude' in request.args or 'include' in request.args:
+        param = 'exclude' if 'exclude' in request.args else 'include'
+        excluded, unknown = parse_tickers(request.args[param])
+        if unknown: return jsonify({"error": "Unknown tickers: " + ", ".join(unknown)}), 400
+        if not excluded: return jsonify({"error": "%s needs at least one ticker" % param}), 400
+        if 'include' in request.args: excluded = frozenset(STARTUP_TICKERS_FULL) - excluded
     
-    nifty_data = {}
-    if not nifty_raw.empty:
-        col = 'Adj Close' if 'Adj Close' in nifty_raw else 'Close'
-        nifty_series = nifty_raw[col].ffill().bfill()
-        if isinstance(nifty_series, pd.DataFrame): nifty_series = nifty_series[BENCHMARK_TICKER]
-        nifty_index = (nifty_series / nifty_series.iloc[0]) * 100
-        nifty_index.index = nifty_index.index.strftime('%Y-%m-%d')
-        nifty_data = nifty_index.to_dict()
-
-    if startup_data is None: return jsonify({"error": "No data found"}), 404
-        
-    response = {
-        "dates": list(startup_data.keys()),
-        "startup_index": list(startup_data.values()),
-        "nifty_index": [nifty_data.get(date, None) for date in startup_data.keys()],
-    }
-    return jsonify(response)
+    snapshot = get_snapshot(start_date)
+
+    def build():
+        levels = subset_market_cap(snapshot, excluded) if excluded else None
+        points = index_points(snapshot, start_date, end_date_str=end_date, levels=levels, max_points=points_limit)
+        if points is None: return None
+        with metrics.stage("serialize"):
+            if compact: return compact_chart(points, snapshot['stale'])
+            return json.dumps({
+                **points,
+                # True when some upstream downloads missed their deadline and older bars are shown
+                "stale": snapshot['stale'],
+            }, separators=(',', ':')).encode()
+
+    mimetype = 'application/octet-stream' if compact else 'application/json'
+    return cached_response(snapshot, ("chart", start_date, end_date, compact, tuple(sorted(excluded)), points_limit), build, mimetype)
 
 @app.route('/api/startups/composition', methods=['GET'])
 def startup_composition():
     """Returns the latest Snapshot of all companies with real weights."""
-    meta_df = get_fundamental_data(STARTUP_TICKERS_FULL)
-    
-    # Fetch last 5 days to ensure we get a valid price
-    end_date = datetime.today()
-    start_date = end_date - timedelta(days=5)
-    
-    data = yf.download(STARTUP_TICKERS_FULL, start=start_date, end=end_date, threads=False, auto_adjust=False, progress=False)
-    
-    if data.empty:
-        return jsonify([])
+    snapshot = get_snapshot()
+    def build():
+        with metrics.stage("serialize"):
+            return json.dumps(snapshot['composition'], separators=(',', ':')).encode()
 
-    # Extract latest prices safely
-    if 'Adj Close' in data.columns.levels[0]:
-        latest_prices_df = data['Adj Close']
-    else:
-        latest_prices_df = data['Close']
-        
-    # Get the very last row of prices
-    latest_prices = latest_prices_df.iloc[-1]
-    
-    composition_list = []
-    total_mkt_cap = 0
-    temp_data = []
+    response = cached_response(snapshot, "composition", build)
+    response.headers['X-Data-Stale'] = str(snapshot['stale']).lower()
+    return response
 
-    for ticker in STARTUP_TICKERS_FULL:
-        # Check if we have price data for this ticker
-        if ticker in latest_prices:
-            price = latest_prices[ticker]
-            
-            # Check if price is valid (not NaN)
-            if pd.isna(price):
-                # Try finding the last valid price in the series
-                valid_series = latest_prices_df[ticker].dropna()
-                if not valid_series.empty:
-                    price = valid_series.iloc[-1]
-                else:
-                    continue # Skip if no price data at all
-
-            shares = meta_df.loc[ticker, 'shares']
-            mkt_cap = price * shares
-            total_mkt_cap += mkt_cap
-            
-            temp_data.append({
-                "ticker": ticker,
-                "price": price,
-                "mkt_cap": mkt_cap
-            })
-
-    # Second pass: Calculate Weights
-    for item in temp_data:
-        ticker = item['ticker']
-        details = TICKER_MAP.get(ticker, {"name": ticker, "sector": "Tech"})
-        
-        weight = (item['mkt_cap'] / total_mkt_cap) * 100
-        
-        composition_list.append({
-            "ticker": ticker.replace(".NS", "").replace(".BO", ""),
-            "name": details['name'],
-            "sector": details['sector'],
-            "price": round(item['price'], 2),
-            "mkt_cap": round(item['mkt_cap'] / 10000000), # In Crores
-            "weight": round(weight, 2),
-            # Mock High/Low for UI display
-            "high": round(item['price'] * 1.15, 2),
-            "low": round(item['price'] * 0.85, 2)
-        })
-    
-    composition_list.sort(key=lambda x: x['weight'], reverse=True)
-    
-    return jsonify(composition_list)
+@app.route('/api/startups/stream', methods=['GET'])
+def startup_stream():
+    """Server-sent events: the full chart once, then only new points and changed composition rows."""
+    start_date = request.args.get('start', '2026-01-01')
+    points_limit, error = requested_points()
+    if error: return jsonify({"error": error}), 400
+    if not STREAM_SLOTS.acquire(blocking=False):
+        # EventSource gives up on a non-200 answer and script.js falls back to polling
+        metrics.STREAMS_REJECTED.inc()
+        return Response("Too many open streams, poll /api/startups/chart instead\n", status=503,
+                        mimetype='text/plain', headers={'Retry-After': str(REFRESH_INTERVAL)})
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    response = Response(stream_events(start_date, points_limit), mimetype='text/event-stream', headers=headers)
+    # Runs when the server closes the response, also if the generator never started
+    response.call_on_close(STREAM_SLOTS.release)
+    return response
+
+@app.route('/api/startups/risk', methods=['GET'])
+def startup_risk():
+    """Risk metrics for the index, NIFTY and all constituents; curves=all adds constituent curves."""
+    start_date = request.args.get('start', '2026-01-01')
+    end_date = request.args.get('end', datetime.today().strftime('%Y-%m-%d'))
+    all_curves = request.args.get('curves') == 'all'
+    snapshot = get_snapshot(start_date)
+
+    def build():
+        risk = calculate_risk(snapshot, start_date, end_date, all_curves)
+        if risk is None: return None
+        return json.dumps(risk, separators=(',', ':')).encode()
+
+    # Computed once per store generation and parameters, then served from the body cache
+    return cached_response(snapshot, ("risk", start_date, end_date, all_curves), build)
+
+@app.route('/api/startups/intraday', methods=['GET'])
+def startup_intraday():
+    """Current session's index and NIFTY per minute (previous close = 100); since=<epoch> returns only newer points."""
+    if INTRADAY_BUFFER.session is None:
+        try:
+            SINGLE_FLIGHT.do('intraday', poll_intraday if not LEADER.attempted else intraday_job)
+        except Exception:
+            app.logger.exception("Intraday poll failed")
+    since = request.args.get('since', type=int)
+    if since is not None:
+        return jsonify(intraday_points(since))
+
+    state = {"generation": ("intraday", INTRADAY_BUFFER.version), "stale": INTRADAY_STALE, "modified_at": INTRADAY_BUFFER.last_time or 0}
+    # Buffer versions are per process, so intraday bodies stay out of the shared tier
+    return cached_response(state, "intraday", lambda: json.dumps(intraday_points(), separators=(',', ':')).encode(), shared=False)
+
+@app.route('/api/startups/sectors', methods=['GET'])
+def startup_sectors():
+    """Market-cap weighted sub-index (100 at start) and current weight of every sector."""
+    start_date = request.args.get('start', '2026-01-01')
+    end_date = request.args.get('end', datetime.today().strftime('%Y-%m-%d'))
+    points_limit, error = requested_points()
+    if error: return jsonify({"error": error}), 400
+    snapshot = get_snapshot(start_date)
+
+    def build():
+        points = sector_points(snapshot, start_date, end_date, points_limit)
+        if points is None: return None
+        with metrics.stage("serialize"):
+            return json.dumps(dict(points, stale=snapshot['stale']), separators=(',', ':')).encode()
+
+    return cached_response(snapshot, ("sectors", start_date, end_date, points_limit), build)
+
+@app.route('/api/startups/backtest', methods=['GET'])
+def startup_backtest():
+    """Alternative weightings of the startup basket; every combination of the comma separated
+    weighting (market, equal, float), cap (e.g. 0.1, none) and rebalance (monthly, quarterly, none)."""
+    start_date = request.args.get('start', '2026-01-01')
+    end_date = request.args.get('end', datetime.today().strftime('%Y-%m-%d'))
+    configs, error = backtest_grid()
+    if error: return jsonify({"error": error}), 400
+    points_limit, error = requested_points()
+    if error: return jsonify({"error": error}), 400
+    snapshot = get_snapshot(start_date)
+
+    def build():
+        window, results = run_backtest_grid(snapshot, start_date, end_date, configs)
+        if results is None: return None
+        dates = snapshot['matrix'].labels[window]
+        rows = np.arange(len(dates))
+        if points_limit and len(dates) > points_limit:
+            rows = downsample_indices([r['levels'] for r in results], points_limit)
+        with metrics.stage("serialize"):
+            return json.dumps({
+                "dates": dates[rows].tolist(),
+                "results": [dict(config,
+                                 index=_round_list(result['levels'][rows], 2),
+                                 **{name: _round_list([result[name]], 3)[0]
+                                    for name in ("total_return", "cagr", "volatility", "max_drawdown", "beta", "turnover")})
+                            for config, result in zip(configs, results)],
+                "stale": snapshot['stale'],
+            }, separators=(',', ':')).encode()
+
+    key = ("backtest", start_date, end_date, tuple(tuple(c.values()) for c in configs), points_limit)
+    return cached_response(snapshot, key, build)
+
+@app.route('/api/indices', methods=['GET'])
+def list_indices():
+    """All configured indices with their current level against the base date."""
+    snapshot = get_snapshot()
+    if snapshot['index_state'] is None: return jsonify([])
+    return jsonify(INDEX_ENGINE.describe(snapshot['index_state'][0]))
+
+@app.route('/api/indices/<index_id>/chart', methods=['GET'])
+def index_chart_data(index_id):
+    if index_id not in INDEX_DEFINITIONS: return jsonify({"error": "Unknown index"}), 404
+
+    start_date = request.args.get('start', INDEX_DEFINITIONS[index_id].get('base_date') or HISTORY_START)
+    end_date = request.args.get('end', datetime.today().strftime('%Y-%m-%d'))
+    points_limit, error = requested_points()
+    if error: return jsonify({"error": error}), 400
+    snapshot = get_snapshot(start_date)
+
+    def build():
+        points = index_points(snapshot, start_date, end_date_str=end_date, index_id=index_id, key="index", max_points=points_limit)
+        if points is None: return None
+        return json.dumps(dict(points, stale=snapshot['stale']), separators=(',', ':')).encode()
+
+    return cached_response(snapshot, ("index", index_id, start_date, end_date, points_limit), build)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage timings, upstream calls, cache hit rates and payload sizes in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
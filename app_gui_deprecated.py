@@ -6,6 +6,8 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 import plotly.express as px
+from providers import get_provider
+from analytics import calculate_risk_metrics
 
 
 GREEN_TICKERS_FULL = [
@@ -28,6 +30,8 @@ STARTUP_TICKERS_FULL = [
 
 BENCHMARK_TICKER = "^NSEI"
 
+PROVIDER = get_provider()
+
 st.set_page_config(page_title="Market Analyzer Pro", layout="wide")
 st.title("Market Analyzer Pro: Equity Terminal")
 
@@ -82,29 +86,12 @@ def fetch_fundamental_data(tickers):
 def calculate_weighted_index(tickers, start_date, end_date, shares_series):
     if not tickers: return None
     
-    start_str = start_date.strftime('%Y-%m-%d')
-    end_str = (end_date + timedelta(days=1)).strftime('%Y-%m-%d')
-    
-    
-    raw_data = yf.download(tickers, start=start_str, end=end_str, threads=False, auto_adjust=False, progress=False)
+    panel = PROVIDER.download(tickers, start_date, end_date + timedelta(days=1))
     
-    if raw_data.empty: return None
-
-    if len(tickers) == 1:
-        ticker = tickers[0]
-        if 'Adj Close' in raw_data.columns:
-            prices = raw_data[['Adj Close']].rename(columns={'Adj Close': ticker})
-        elif 'Close' in raw_data.columns:
-            prices = raw_data[['Close']].rename(columns={'Close': ticker})
-        else:
-            return None
-    else:
-        if 'Adj Close' in raw_data.columns.levels[0]:
-            prices = raw_data['Adj Close']
-        elif 'Close' in raw_data.columns.levels[0]:
-            prices = raw_data['Close']
-        else:
-            prices = raw_data.iloc[:, :len(tickers)]
+    if not panel: return None
+
+    prices = panel.get('Adj Close', panel.get('Close'))
+    if prices is None: return None
     
     prices = prices.dropna(axis=1, how='all').ffill().bfill()
     if prices.empty: return None
@@ -130,18 +117,14 @@ def fetch_rich_stats(tickers, end_date):
     if not tickers: return pd.DataFrame()
     
     start_lookback = end_date - timedelta(days=370)
-    end_str = (end_date + timedelta(days=1)).strftime('%Y-%m-%d')
     
-    data = yf.download(tickers, start=start_lookback, end=end_str, group_by='ticker', threads=False, auto_adjust=False, progress=False)
+    panel = PROVIDER.download(tickers, start_lookback, end_date + timedelta(days=1))
     
     stats = []
     
     for ticker in tickers:
         try:
-            if len(tickers) > 1:
-                df = data[ticker].copy()
-            else:
-                df = data.copy() 
+            df = pd.DataFrame({field: frame[ticker] for field, frame in panel.items() if ticker in frame})
             
             df = df.dropna(how='all')
             if df.empty: continue
@@ -204,18 +187,6 @@ def generate_full_report(rich_stats_df, metadata_df):
     
     return final_df
 
-def calculate_risk_metrics(series, name):
-    if series is None or len(series) < 2:
-        return {"Name": name, "Volatility": np.nan, "Max Drawdown": np.nan}
-    daily_ret = series.pct_change().dropna()
-    volatility = daily_ret.std() * np.sqrt(252) * 100
-    cumulative = (1 + daily_ret).cumprod()
-    peak = cumulative.cummax()
-    drawdown = (cumulative - peak) / peak
-    max_drawdown = drawdown.min() * 100
-    return {"Name": name, "Volatility (Ann.)": f"{volatility:.2f}%", "Max Drawdown": f"{max_drawdown:.2f}%"}
-
-
 st.sidebar.header("Configuration")
 
 
@@ -264,13 +235,9 @@ def render_live_dashboard(start_date, end_date, selected_green, selected_startup
     g_series = calculate_weighted_index(selected_green, start_date, end_date, st.session_state['green_meta']['shares'])
     s_series = calculate_weighted_index(selected_startup, start_date, end_date, st.session_state['startup_meta']['shares'])
     
-    end_str = (end_date + timedelta(days=1)).strftime('%Y-%m-%d')
-    nifty_data = yf.download(BENCHMARK_TICKER, start=start_date, end=end_str, threads=False, auto_adjust=False, progress=False)
-    if not nifty_data.empty:
-        try:
-            bench = nifty_data['Adj Close'][BENCHMARK_TICKER]
-        except:
-            bench = nifty_data['Adj Close']
+    nifty_data = PROVIDER.download([BENCHMARK_TICKER], start_date, end_date + timedelta(days=1))
+    if nifty_data:
+        bench = nifty_data.get('Adj Close', nifty_data.get('Close'))[BENCHMARK_TICKER]
         bench = bench.ffill().bfill()
         n_series = (bench / bench.iloc[0]) * 100
     else:
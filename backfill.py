@@ -0,0 +1,144 @@
+"""Bulk historical backfill of the local price store.
+
+Downloads daily OHLCV for every index constituent and the benchmark in ticker x date
+chunks on a bounded pool, through the same rate-limited upstream client as the API, and
+merges them straight into the store. Progress is checkpointed, so an interrupted run
+picks up where it stopped:
+
+    python backfill.py --start 2015-01-01
+    python backfill.py --start 2015-01-01 --tickers NEWCO.NS,OTHER.NS --workers 2
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+os.environ.setdefault("BACKGROUND_REFRESH", "0")
+
+import pandas as pd
+
+import api
+from upstream import UpstreamClient
+
+
+def plan(tickers, start, end, chunk_tickers, chunk_days):
+    """(tickers, start, end) jobs covering [start, end] with exclusive window ends."""
+    start, stop = pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)
+    windows = []
+    while start < stop:
+        window_end = min(start + pd.Timedelta(days=chunk_days), stop)
+        windows.append((start, window_end))
+        start = window_end
+    return [(tickers[i:i + chunk_tickers], s, e)
+            for s, e in windows for i in range(0, len(tickers), chunk_tickers)]
+
+
+def job_key(job):
+    tickers, start, end = job
+    return "%s|%s|%s" % (",".join(tickers), start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return set(json.load(f)['done'])
+    except (OSError, ValueError, KeyError):
+        return set()
+
+
+def save_checkpoint(path, done):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"updated": datetime.now().isoformat(timespec="seconds"), "done": sorted(done)}, f)
+    os.replace(tmp, path)
+
+
+def run(jobs, store, provider, checkpoint, workers, flush_every):
+    """Runs the jobs not in the checkpoint; returns the keys of the jobs that failed."""
+    done = load_checkpoint(checkpoint)
+    todo = [job for job in jobs if job_key(job) not in done]
+    print("%d of %d chunks left (%d done earlier)" % (len(todo), len(jobs), len(jobs) - len(todo)))
+
+    failed, batch = [], []
+
+    def flush():
+        # Store first, checkpoint second: a crash in between only repeats downloads
+        if batch:
+            store.write([(tickers, frames) for (tickers, _, _), frames in batch])
+            done.update(job_key(job) for job, _ in batch)
+            save_checkpoint(checkpoint, done)
+            batch.clear()
+
+    started = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill")
+    futures = {pool.submit(provider.download, *job): job for job in todo}
+    try:
+        for n, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            try:
+                batch.append((job, future.result()))
+                status = "ok"
+            except Exception as e:
+                failed.append(job_key(job))
+                status = "failed (%s)" % e
+            print("[%d/%d] %-40s %s..%s %s" % (
+                n, len(todo), ",".join(job[0])[:40], job[1].strftime("%Y-%m-%d"), job[2].strftime("%Y-%m-%d"), status))
+            if len(batch) >= flush_every:
+                flush()
+    except KeyboardInterrupt:
+        print("Interrupted, saving progress...")
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        flush()
+        pool.shutdown(wait=False, cancel_futures=True)
+    print("Finished in %.1fs, %d chunks failed" % (time.perf_counter() - started, len(failed)))
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--start", default=api.HISTORY_START)
+    parser.add_argument("--end", default=datetime.today().strftime("%Y-%m-%d"))
+    parser.add_argument("--tickers", help="comma separated (default: every index constituent and the benchmark)")
+    parser.add_argument("--chunk-tickers", type=int, default=10)
+    parser.add_argument("--chunk-days", type=int, default=365)
+    parser.add_argument("--workers", type=int, default=api.UPSTREAM_WORKERS)
+    parser.add_argument("--rate", type=float, default=api.UPSTREAM_RATE, help="ticker requests per second")
+    parser.add_argument("--flush-every", type=int, default=20, help="chunks merged per store generation")
+    parser.add_argument("--checkpoint", help="progress file (default <store>/backfill.json)")
+    parser.add_argument("--reset", action="store_true", help="ignore earlier progress")
+    args = parser.parse_args(argv)
+
+    tickers = args.tickers.split(",") if args.tickers else api.INDEX_ENGINE.universe + [api.BENCHMARK_TICKER]
+    checkpoint = args.checkpoint or os.path.join(api.PRICE_STORE_DIR, "backfill.json")
+    os.makedirs(os.path.dirname(checkpoint) or ".", exist_ok=True)
+    if args.reset and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    # Same budget and circuit breaker as the API, but chunks wait for tokens instead of giving up
+    provider = UpstreamClient(api.PROVIDER.provider, rate=args.rate, burst=api.UPSTREAM_BURST, retries=api.UPSTREAM_RETRIES,
+                              threshold=api.CIRCUIT_THRESHOLD, reset_timeout=api.CIRCUIT_RESET, acquire_timeout=None)
+    jobs = plan(tickers, args.start, args.end, args.chunk_tickers, args.chunk_days)
+    try:
+        failed = run(jobs, api.PRICE_STORE, provider, checkpoint, args.workers, args.flush_every)
+    except KeyboardInterrupt:
+        return 130
+    if failed:
+        print("Re-run the same command to retry the failed chunks")
+        return 1
+
+    # Only complete history for every ticker moves the store's coverage back
+    if not args.tickers:
+        api.PRICE_STORE.write([], covered_from=args.start)
+    print("Store generation %d, %d tickers" % (
+        api.PRICE_STORE.generation, len(next(iter(api.PRICE_STORE.frames().values())).columns) if api.PRICE_STORE.frames() else 0))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
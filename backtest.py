@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from analytics import risk_matrix
+
+# Alternative-weighting backtests.
+# Every configuration (weighting scheme, single-name cap, rebalance schedule) is run over
+# the same forward-filled price and market cap matrices. Configurations sharing a schedule
+# are valued together: per rebalance period one matrix product prices the holdings of all
+# of them, so a grid costs about as much as its number of schedules.
+
+WEIGHTINGS = ("market", "equal", "float")
+SCHEDULES = ("monthly", "quarterly", "none")
+
+
+def rebalance_rows(dates, schedule):
+    """Rows of the first trading day of every month/quarter, always including row 0."""
+    dates = pd.DatetimeIndex(dates)
+    if schedule == "none" or len(dates) == 0:
+        return np.array([0])
+    period = dates.to_period("M" if schedule == "monthly" else "Q").asi8
+    return np.flatnonzero(np.r_[True, period[1:] != period[:-1]])
+
+
+def capped_weights(weights, cap):
+    """Rows of `weights` normalized to 1 with no name above `cap` (per row); the excess is
+    spread over the uncapped names in proportion to their weight. A cap below 1/n is
+    raised to 1/n, i.e. equal weight."""
+    weights = np.asarray(weights, dtype=float)
+    totals = weights.sum(axis=-1, keepdims=True)
+    weights = np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+    cap = np.broadcast_to(np.asarray(cap, dtype=float), weights.shape[:-1])[..., None]
+    names = (weights > 0).sum(axis=-1, keepdims=True)
+    cap = np.maximum(cap, np.divide(1.0, names, out=np.ones_like(cap), where=names > 0))
+
+    capped = np.zeros(weights.shape, dtype=bool)
+    for _ in range(weights.shape[-1]):
+        over = weights > cap + 1e-12
+        if not over.any():
+            break
+        capped |= over
+        excess = np.where(over, weights - cap, 0.0).sum(axis=-1, keepdims=True)
+        weights = np.where(over, cap, weights)
+        free = np.where(capped, 0.0, weights)
+        room = free.sum(axis=-1, keepdims=True)
+        weights = weights + np.divide(free * excess, room, out=np.zeros_like(weights), where=room > 0)
+    return weights
+
+
+def target_weights(caps, configs, float_factors=None):
+    """(configs x names) target weights from one row of member market caps."""
+    eligible = caps > 0
+    base = {
+        "market": np.where(eligible, caps, 0.0),
+        "equal": eligible.astype(float),
+        "float": np.where(eligible, caps * (1.0 if float_factors is None else float_factors), 0.0),
+    }
+    weights = np.array([base[c['weighting']] for c in configs])
+    return capped_weights(weights, [c.get('cap') or np.inf for c in configs])
+
+
+def run_backtests(dates, prices, caps, configs, float_factors=None):
+    """Levels (dates x configs, 100 on the first day) and mean one-way turnover per rebalance.
+
+    `prices` and `caps` are (dates x names) with the same columns; a name is only bought
+    at a rebalance where its market cap is positive (it is a member with a price).
+    """
+    prices = np.nan_to_num(np.asarray(prices, dtype=float))
+    caps = np.nan_to_num(np.asarray(caps, dtype=float))
+    levels = np.full((len(prices), len(configs)), np.nan)
+    turnover = np.zeros(len(configs))
+
+    for schedule in SCHEDULES:
+        group = [k for k, c in enumerate(configs) if c['rebalance'] == schedule]
+        if not group or len(prices) == 0:
+            continue
+        subset = [configs[k] for k in group]
+        rows = rebalance_rows(dates, schedule)
+        value = np.full(len(group), 100.0)
+        holdings = None
+        trades = 0
+        for i, row in enumerate(rows):
+            end = rows[i + 1] if i + 1 < len(rows) else len(prices)
+            if holdings is not None:
+                value = holdings @ prices[row]
+            weights = target_weights(caps[row], subset, float_factors)
+            if holdings is not None:
+                drifted = np.divide(holdings * prices[row], value[:, None], out=np.zeros_like(weights), where=value[:, None] > 0)
+                turnover[group] += np.abs(weights - drifted).sum(axis=1) / 2
+                trades += 1
+            holdings = np.divide(weights * value[:, None], prices[row], out=np.zeros_like(weights), where=prices[row] > 0)
+            levels[row:end, group] = prices[row:end] @ holdings.T
+        if trades:
+            turnover[group] /= trades
+    return levels, turnover
+
+
+def summarize(dates, levels, benchmark=None):
+    """Total return, CAGR, volatility and max drawdown (percent) and beta per column."""
+    dates = pd.DatetimeIndex(dates)
+    risk = risk_matrix(levels, benchmark=benchmark, windows=())
+    years = (dates[-1] - dates[0]).days / 365.25 if len(dates) > 1 else 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        growth = levels[-1] / levels[0]
+        cagr = (growth ** (1 / years) - 1) * 100 if years > 0 else np.full(levels.shape[1], np.nan)
+    return {
+        "total_return": (growth - 1) * 100,
+        "cagr": cagr,
+        "volatility": risk['volatility'],
+        "max_drawdown": risk['max_drawdown'],
+        "beta": risk['beta'],
+    }
@@ -0,0 +1,206 @@
+"""Micro-benchmarks for the index math on synthetic price panels.
+
+Drives the functions behind the API with generated panels (25 to 5,000 tickers,
+1 to 20 years of daily bars) and records wall time and peak traced memory per stage.
+Results are written as JSON so runs can be compared:
+
+    python bench.py --quick --out bench_results/base.json
+    python bench.py --quick --compare bench_results/base.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("BACKGROUND_REFRESH", "0")
+
+import numpy as np
+import pandas as pd
+
+import api
+from analytics import calculate_risk_metrics, risk_matrix
+from index_engine import IndexEngine
+from price_matrix import PriceMatrix
+from price_store import PriceStore
+from providers import ReplayProvider, synthetic_panel
+
+TRADING_DAYS = 252
+DEFAULT_TICKERS = [25, 250, 1000, 5000]
+DEFAULT_YEARS = [1, 5, 20]
+QUICK_TICKERS = [25, 250]
+QUICK_YEARS = [1, 5]
+
+
+def measure(fn, repeat):
+    """Median/min wall time over `repeat` runs plus peak traced memory of one extra run."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "time_s": statistics.median(times),
+        "time_min_s": min(times),
+        "peak_mb": peak / 2 ** 20,
+    }
+
+
+def stages(n_tickers, years):
+    """Yields (name, fn) for every benchmarked stage on one panel size."""
+    n_days = years * TRADING_DAYS
+    panel = synthetic_panel(n_tickers, n_days, seed=n_tickers * 31 + years)
+    tickers = list(panel['Close'].columns)
+    first = panel['Close'].index[0]
+    last = panel['Close'].index[-1]
+    start = first.strftime("%Y-%m-%d")
+    end = last.strftime("%Y-%m-%d")
+    # A year back from the end, like the dashboard's default request
+    window_start = panel['Close'].index[max(0, n_days - TRADING_DAYS)].strftime("%Y-%m-%d")
+
+    store_dir = tempfile.mkdtemp(prefix="bench_store_")
+    provider = ReplayProvider(panel=panel)
+    store = PriceStore(store_dir, start, refresh_interval=float("inf"), provider=provider)
+
+    def ingest():
+        # Cold ingest into an empty store
+        cold_dir = tempfile.mkdtemp(prefix="bench_ingest_")
+        try:
+            PriceStore(cold_dir, start, provider=provider).ensure(tickers, start, end)
+        finally:
+            shutil.rmtree(cold_dir, ignore_errors=True)
+
+    store.ensure(tickers, start, end)
+    api.PRICE_STORE = store
+    # The panel is the startup index for the API code under test
+    api.INDEX_ENGINE = IndexEngine({"startups": {"constituents": tickers, "shares": {}}})
+    meta_df = api.get_fundamental_data(tickers)
+    view = store.view()
+    matrix = api.get_price_matrix(view)
+    state = api.get_index_state(None, view)
+    snapshot = {"generation": view[1], "index_state": state, "matrix": matrix, "nifty": None}
+    frames = store.frames()
+    prices = frames['Adj Close']
+    levels = pd.Series(state[0].levels[:, 0], index=state[0].dates)
+    excluded = frozenset(tickers[:max(1, n_tickers // 10)])
+    sectors = api.calculate_sectors(state[0])
+
+    def subset():
+        api._SUBSET_CACHE.clear()
+        api.subset_market_cap(snapshot, excluded)
+
+    def risk_constituents():
+        for ticker in tickers:
+            calculate_risk_metrics(prices[ticker], ticker)
+
+    try:
+        yield "store_ingest", ingest
+        yield "price_matrix", lambda: PriceMatrix(frames, view[1])
+        yield "index_state_build", lambda: api.get_index_state(None, view)
+        # One new day on top of the existing state, what a refresh costs
+        yield "index_state_update", lambda: api.INDEX_ENGINE.update(state[0], prices.iloc[-1:])
+        yield "price_matrix_update", lambda: matrix.extended(frames, view[1] + 1, prices.index[-1])
+        yield "sectors_update", lambda: api.calculate_sectors(api.INDEX_ENGINE.update(state[0], prices.iloc[-1:]), sectors)
+        yield "index_points", lambda: api.index_points(snapshot, window_start)
+        yield "subset_market_cap", subset
+        yield "composition", lambda: api.calculate_composition(tickers, meta_df, matrix)
+        yield "risk_metrics_index", lambda: calculate_risk_metrics(levels, "Index")
+        yield "risk_metrics_constituents", risk_constituents
+        yield "risk_matrix", lambda: risk_matrix(prices.to_numpy(), benchmark=levels.to_numpy())
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(ticker_sizes, year_sizes, repeat, only=None):
+    results = []
+    for n_tickers in ticker_sizes:
+        for years in year_sizes:
+            for name, fn in stages(n_tickers, years):
+                if only and name not in only:
+                    continue
+                row = {"stage": name, "tickers": n_tickers, "years": years}
+                row.update(measure(fn, repeat))
+                results.append(row)
+                print("%-26s %5d tickers %3d y  %9.2f ms  %9.1f MB" % (
+                    name, n_tickers, years, row['time_s'] * 1000, row['peak_mb']))
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Prints stages that got slower than the baseline by more than `threshold`."""
+    with open(baseline_path) as f:
+        baseline = {(r['stage'], r['tickers'], r['years']): r for r in json.load(f)['results']}
+
+    regressions = []
+    for row in results:
+        old = baseline.get((row['stage'], row['tickers'], row['years']))
+        if old is None or old['time_s'] == 0:
+            continue
+        ratio = row['time_s'] / old['time_s']
+        if ratio > 1 + threshold:
+            regressions.append((row, ratio))
+            print("REGRESSION %-26s %5d tickers %3d y  %.2fx slower" % (
+                row['stage'], row['tickers'], row['years'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=lambda v: [int(x) for x in v.split(",")], default=DEFAULT_TICKERS)
+    parser.add_argument("--years", type=lambda v: [int(x) for x in v.split(",")], default=DEFAULT_YEARS)
+    parser.add_argument("--quick", action="store_true", help="small grid for local runs")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stage", action="append", help="only run this stage (repeatable)")
+    parser.add_argument("--out", help="results file (default bench_results/<timestamp>.json)")
+    parser.add_argument("--compare", help="baseline results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.tickers, args.years = QUICK_TICKERS, QUICK_YEARS
+
+    results = run(args.tickers, args.years, args.repeat, only=args.stage)
+
+    out = args.out or os.path.join("bench_results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "meta": {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "machine": platform.machine(),
+            },
+            "results": results,
+        }, f, indent=2)
+    print("Saved %d results to %s" % (len(results), out))
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import numpy as np
+
+# Shape-preserving downsampling for long chart ranges.
+# Largest-Triangle-Three-Buckets keeps the first and last point and, per bucket, the point
+# forming the largest triangle with the previously kept point and the next bucket's mean,
+# so peaks and troughs survive while the point count stays fixed.
+
+
+def lttb(y, n, x=None):
+    """Indices of `n` points of `y` chosen by LTTB (all indices if y is not longer than n).
+
+    `y` may be 2-D (points x series); a point's triangle is then the sum over the series.
+    `x` defaults to 0..len(y) - 1.
+    """
+    y = np.asarray(y, dtype=float)
+    size = len(y)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return np.array([0, size - 1])[:max(n, 0)]
+
+    x = np.arange(size, dtype=float) if x is None else np.asarray(x, dtype=float)
+    if y.ndim == 1:
+        y = y[:, None]
+    # n - 2 buckets between the fixed first and last point
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    selected = np.empty(n, dtype=int)
+    selected[0], selected[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else size
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean(axis=0)
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end, None]) * (avg_y - y[a])).sum(axis=1)
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_indices(columns, n):
+    """Rows to keep so that every column keeps its shape within a total budget of `n` rows.
+
+    Each series gets an equal share of the budget and the selections are merged; when the
+    merge is longer than `n`, one more LTTB pass over the merged rows (all series, each
+    scaled to its range) cuts it to `n`, so a shared x axis never has more than `n` points.
+    """
+    columns = [np.asarray(c, dtype=float) for c in columns]
+    size = len(columns[0]) if columns else 0
+    if size <= n:
+        return np.arange(size)
+    usable = []
+    for column in columns:
+        valid = ~np.isnan(column)
+        if valid.sum() < 2:
+            continue
+        # Gaps (e.g. benchmark holidays) are carried forward for the selection only
+        positions = np.where(valid, np.arange(size), 0)
+        np.maximum.accumulate(positions, out=positions)
+        filled = column[positions]
+        filled[:np.argmax(valid)] = column[np.argmax(valid)]
+        usable.append(filled)
+    if not usable:
+        return np.unique(np.linspace(0, size - 1, n).astype(int))
+    share = max(3, n // len(usable))
+    rows = np.unique(np.concatenate([lttb(column, share) for column in usable]))
+    if len(rows) <= n:
+        return rows
+    stacked = np.column_stack(usable)[rows]
+    low, high = stacked.min(axis=0), stacked.max(axis=0)
+    scaled = np.divide(stacked - low, high - low, out=np.zeros_like(stacked), where=high > low)
+    return rows[lttb(scaled, n, x=rows)]
@@ -0,0 +1,66 @@
+"""Fills in missing share counts of the index definitions in indices.json.
+
+Thematic indices are market-cap weighted, so every constituent needs its shares
+outstanding; definitions with gaps are skipped by the API. This looks the missing ones
+up on Yahoo Finance and writes them back, leaving counts that are already set alone:
+
+    python fill_shares.py
+    python fill_shares.py --file indices.json --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+
+from index_engine import missing_shares
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def shares_outstanding(ticker):
+    import yfinance as yf
+    ticker = yf.Ticker(ticker)
+    shares = ticker.fast_info.get("shares") or ticker.info.get("sharesOutstanding")
+    return int(shares) if shares else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--file", default=os.path.join(ROOT, "indices.json"))
+    parser.add_argument("--dry-run", action="store_true", help="print the counts without writing them")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.file):
+        print("%s does not exist, see Multiple Indices in README.md for the format" % args.file)
+        return 1
+    with open(args.file) as f:
+        definitions = json.load(f)
+
+    unresolved = []
+    for index_id, definition in definitions.items():
+        for ticker in missing_shares(definition):
+            try:
+                shares = shares_outstanding(ticker)
+            except Exception as e:
+                shares = None
+                print("%-16s lookup failed (%s)" % (ticker, e))
+            if shares is None:
+                unresolved.append(ticker)
+                continue
+            definition.setdefault('shares', {})[ticker] = shares
+            print("%-16s %d" % (ticker, shares))
+
+    if not args.dry_run:
+        tmp = args.file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(definitions, f, indent=4)
+            f.write("\n")
+        os.replace(tmp, args.file)
+    if unresolved:
+        print("No share count for %s, add them by hand" % ", ".join(unresolved))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
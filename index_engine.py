@@ -0,0 +1,267 @@
+import os
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+from row_buffer import RowBuffer
+
+# Multi-index engine.
+# Index definitions are data ({id: {name, constituents, shares, base_date, events}}). The
+# engine builds one share matrix (tickers x indices) per regime between dated events over
+# the union of constituents, so every configured index comes out of a matrix product with
+# the shared price matrix.
+#
+# Indices are maintained with a divisor: level_t = M_t / D_t, where M_t is the market cap
+# of the basket in effect on t. When shares or constituents change, or a constituent
+# starts trading, the divisor absorbs the jump, so history never has to be rewritten and
+# a new day is level_{t-1} * M_t / M''_t with M''_t = today's basket at yesterday's prices.
+
+DEFAULT_SHARES = 100000000 # same fallback get_fundamental_data uses
+
+log = logging.getLogger(__name__)
+
+
+def missing_shares(definition):
+    """Constituents, including ones added by events, that have no share count."""
+    shares = set(definition.get('shares', {}))
+    tickers = list(definition['constituents'])
+    for event in definition.get('events', []):
+        shares.update(event.get('shares', {}))
+        tickers += event.get('add', [])
+    return [t for t in dict.fromkeys(tickers) if t not in shares]
+
+
+def load_index_definitions(path):
+    """Extra index definitions from a JSON file, {} if the file does not exist.
+
+    A definition without a share count for every constituent is skipped: with the
+    DEFAULT_SHARES fallback it would be price-weighted, not market-cap weighted.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        definitions = json.load(f)
+    for index_id, definition in list(definitions.items()):
+        missing = missing_shares(definition)
+        if missing:
+            log.warning("Skipping index %r: no share counts for %s (python fill_shares.py fills them in)",
+                        index_id, ", ".join(missing))
+            del definitions[index_id]
+    return definitions
+
+
+def chain_levels(caps, carried, previous=None):
+    """Divisor-adjusted levels (rows x indices) from basket market caps.
+
+    `caps` is M_t, `carried` is M''_t (the same basket at the previous day's prices) and
+    `previous` the last known level per index. An index without a level yet starts at its
+    market cap on the first day it has one, so levels stay in market-cap units.
+    """
+    caps = np.atleast_2d(caps)
+    carried = np.atleast_2d(carried)
+    previous = np.zeros(caps.shape[1]) if previous is None else np.asarray(previous, dtype=float)
+    ratios = np.divide(caps, carried, out=np.ones_like(caps), where=carried > 0)
+
+    levels = np.zeros_like(caps)
+    for j in range(caps.shape[1]):
+        if previous[j] > 0:
+            levels[:, j] = previous[j] * np.cumprod(ratios[:, j])
+            continue
+        live = np.flatnonzero(caps[:, j] > 0)
+        if len(live):
+            first = live[0]
+            levels[first:, j] = caps[first, j] * np.cumprod(np.r_[1.0, ratios[first + 1:, j]])
+    return levels
+
+
+class IndexState:
+    """Forward-filled prices, basket market caps and levels of every index up to the last stored day.
+
+    The arrays are views of the first `n` rows of growable buffers that an update shares
+    with the state it started from, whose rows it leaves unchanged; `parent` is that
+    state's token and `revised_from` the first row that differs from it (None after a
+    full build).
+    """
+    FIELDS = ("dates", "prices", "caps", "carried", "levels")
+
+    def __init__(self, ids, dates, prices, caps, carried, levels):
+        buffers = {field: (RowBuffer(rows), 0) for field, rows in
+                   zip(self.FIELDS, (np.asarray(dates), prices, caps, carried, levels))}
+        self._attach(ids, buffers, len(dates), None, None)
+
+    def _attach(self, ids, buffers, n, parent, revised_from):
+        self.ids = ids
+        self.buffers = buffers
+        self.n = n
+        self.token = os.urandom(8).hex()
+        self.parent = parent
+        self.revised_from = revised_from
+        views = {field: buffer.attach(self, slot, n) for field, (buffer, slot) in buffers.items()}
+        self.dates = pd.DatetimeIndex(views["dates"], copy=False)
+        for field in self.FIELDS[1:]:
+            setattr(self, field, views[field])
+
+    def extend(self, start, dates, prices, caps, carried, levels):
+        """New state with these rows from row `start` on, written into the shared buffers."""
+        rows = dict(zip(self.FIELDS, (np.asarray(dates), prices, caps, carried, levels)))
+        state = IndexState.__new__(IndexState)
+        buffers = {field: buffer.write(state, slot, self.n, start, rows[field])
+                   for field, (buffer, slot) in self.buffers.items()}
+        state._attach(self.ids, buffers, start + len(dates), self.token, start)
+        return state
+
+    def __getstate__(self):
+        return {"ids": self.ids, "buffers": self.buffers, "n": self.n, "token": self.token,
+                "parent": self.parent, "revised_from": self.revised_from}
+
+    def __setstate__(self, state):
+        self._attach(state["ids"], state["buffers"], state["n"], state["parent"], state["revised_from"])
+        self.token = state["token"]
+
+    @property
+    def divisors(self):
+        return np.divide(self.caps, self.levels, out=np.full_like(self.caps, np.nan), where=self.levels > 0)
+
+    def frame(self):
+        """Index levels as a DataFrame (dates x index ids)."""
+        return pd.DataFrame(self.levels, index=self.dates, columns=self.ids)
+
+    def totals(self, index_id):
+        j = self.ids.index(index_id)
+        return self.caps[:, j], self.carried[:, j]
+
+
+class IndexEngine:
+    def __init__(self, definitions, default_shares=DEFAULT_SHARES):
+        self.definitions = definitions
+        self.ids = list(definitions)
+
+        events = {index_id: sorted(d.get('events', []), key=lambda e: e['date']) for index_id, d in definitions.items()}
+        self.universe = list(dict.fromkeys(
+            [t for d in definitions.values() for t in d['constituents']] +
+            [t for index_events in events.values() for e in index_events for t in e.get('add', [])]))
+        # Regime r holds from event_dates[r - 1] (inclusive) to event_dates[r]
+        self.event_dates = np.array(sorted({pd.Timestamp(e['date']) for index_events in events.values() for e in index_events}),
+                                    dtype='datetime64[ns]')
+
+        position = {t: i for i, t in enumerate(self.universe)}
+        self.shares = np.zeros((len(self.event_dates) + 1, len(self.universe), len(self.ids)))
+        for j, index_id in enumerate(self.ids):
+            shares = dict(self.definitions[index_id].get('shares', {}))
+            members = set(self.definitions[index_id]['constituents'])
+            pending = list(events[index_id])
+            for r in range(len(self.event_dates) + 1):
+                while pending and (r > 0 and pd.Timestamp(pending[0]['date']) <= self.event_dates[r - 1]):
+                    event = pending.pop(0)
+                    shares.update(event.get('shares', {}))
+                    members.update(event.get('add', []))
+                    members.difference_update(event.get('remove', []))
+                for ticker in members:
+                    self.shares[r, position[ticker], j] = shares.get(ticker, default_shares)
+
+    def _regimes(self, dates):
+        return np.searchsorted(self.event_dates, np.asarray(dates, dtype='datetime64[ns]'), side='right')
+
+    def _baskets(self, dates, prices, previous):
+        """Per-ticker market caps of every index for today's and yesterday's prices.
+
+        A constituent only counts once it has a previous price, so a new listing enters the
+        day after its first bar through the divisor instead of as a jump.
+        """
+        eligible = ~np.isnan(previous)
+        today = np.where(eligible, prices, 0.0)
+        yesterday = np.where(eligible, previous, 0.0)
+        regimes = self._regimes(dates)
+        caps = np.zeros((len(dates), len(self.ids)))
+        carried = np.zeros((len(dates), len(self.ids)))
+        for r in np.unique(regimes):
+            rows = regimes == r
+            caps[rows] = today[rows] @ self.shares[r]
+            carried[rows] = yesterday[rows] @ self.shares[r]
+        return caps, carried
+
+    def _prices(self, prices, seed=None):
+        values = prices.reindex(columns=self.universe).to_numpy(dtype=float)
+        if seed is not None:
+            values = np.vstack([seed, values])
+        values = pd.DataFrame(values).ffill().to_numpy()
+        return values if seed is None else values[1:]
+
+    def build(self, prices):
+        """Full index history from a dates x tickers price frame."""
+        values = self._prices(prices)
+        previous = np.vstack([values[:1], values[:-1]])
+        caps, carried = self._baskets(prices.index, values, previous)
+        return IndexState(self.ids, prices.index, values, caps, carried, chain_levels(caps, carried))
+
+    def update(self, state, prices):
+        """Appends (or revises) the days in `prices` to `state` without recomputing older days.
+
+        `prices` starts at the first new or changed date; stored days from there on are
+        replaced. Cost is proportional to the number of new days times constituents: the
+        rows are written into the state's growable buffers instead of copying the history.
+        """
+        if prices.empty:
+            return state
+        keep = int(state.dates.searchsorted(prices.index[0]))
+        if keep == 0:
+            return self.build(prices)
+
+        last = state.prices[keep - 1]
+        values = self._prices(prices, seed=last)
+        previous = np.vstack([last, values[:-1]])
+        caps, carried = self._baskets(prices.index, values, previous)
+        levels = chain_levels(caps, carried, previous=state.levels[keep - 1])
+        return state.extend(keep, prices.index, values, caps, carried, levels)
+
+    def members(self, index_id, date=None):
+        """{ticker: shares} of an index on `date` (default: the latest regime)."""
+        j = self.ids.index(index_id)
+        r = len(self.event_dates) if date is None else int(self._regimes([pd.Timestamp(date)])[0])
+        return {self.universe[i]: self.shares[r, i, j] for i in np.flatnonzero(self.shares[r, :, j])}
+
+    def constituents(self, index_id):
+        """Every ticker that is a member of the index in some regime, in universe order."""
+        j = self.ids.index(index_id)
+        return [self.universe[i] for i in np.flatnonzero(self.shares[:, :, j].any(axis=0))]
+
+    def constituent_market_caps(self, state, index_id, start=0):
+        """Per-ticker market caps (dates x tickers) of one index at today's and yesterday's
+        prices from row `start` on; their row sums are the index's caps and carried caps."""
+        j = self.ids.index(index_id)
+        rows = np.flatnonzero(self.shares[:, :, j].any(axis=0))
+        members = [self.universe[i] for i in rows]
+        dates = state.dates[start:]
+        values = state.prices[start:, rows]
+        previous = np.vstack([state.prices[start - 1, rows] if start else values[:1], values[:-1]])
+        eligible = ~np.isnan(previous)
+        shares = self.shares[self._regimes(dates)][:, rows, j]
+        caps = np.where(eligible, values, 0.0) * shares
+        carried = np.where(eligible, previous, 0.0) * shares
+        return pd.DataFrame(caps, index=dates, columns=members), pd.DataFrame(carried, index=dates, columns=members)
+
+    def describe(self, state):
+        """Id, name, size, base date, current level (100 at the base date) and divisor of every index."""
+        levels = state.frame()
+        divisors = state.divisors
+        summary = []
+        for j, index_id in enumerate(self.ids):
+            definition = self.definitions[index_id]
+            base_date = definition.get('base_date')
+            series = levels[index_id]
+            base = series.loc[pd.Timestamp(base_date):] if base_date else series
+            level = None
+            if not base.empty and base.iloc[0] != 0:
+                level = round(float(series.iloc[-1] / base.iloc[0] * 100), 2)
+            divisor = divisors[-1, j] if len(divisors) else np.nan
+            summary.append({
+                "id": index_id,
+                "name": definition.get('name', index_id),
+                "constituents": len(self.members(index_id)),
+                "base_date": base_date,
+                "level": level,
+                "divisor": None if np.isnan(divisor) else round(float(divisor), 6),
+            })
+        return summary
@@ -0,0 +1,69 @@
+import threading
+
+import numpy as np
+
+# Intraday ticks.
+# The current session's index values live in fixed-size arrays used as a ring buffer, so
+# memory is bounded by the capacity and a read copies at most `capacity` rows however
+# long the session has been running.
+
+SESSION_MINUTES = 375 # 09:15 to 15:30
+
+
+class RingBuffer:
+    """Fixed-capacity (timestamp, values) buffer; the oldest rows are overwritten when full."""
+
+    def __init__(self, capacity=512, width=2):
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((capacity, width), np.nan)
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        # Bumped on every write, used to validate cached responses
+        self.version = 0
+        self.session = None
+        self.lock = threading.Lock()
+
+    def _slot(self, i):
+        return (self.start + i) % self.capacity
+
+    def reset(self, session=None):
+        with self.lock:
+            self.start = self.size = 0
+            self.session = session
+            self.version += 1
+
+    def append(self, timestamp, values):
+        """Adds a row; a row with the last timestamp replaces it (the last minute bar may still change)."""
+        with self.lock:
+            if self.size and timestamp <= self.times[self._slot(self.size - 1)]:
+                if timestamp < self.times[self._slot(self.size - 1)]:
+                    return False
+                slot = self._slot(self.size - 1)
+            elif self.size < self.capacity:
+                slot = self._slot(self.size)
+                self.size += 1
+            else:
+                slot = self.start
+                self.start = self._slot(1)
+            self.times[slot] = timestamp
+            self.values[slot] = values
+            self.version += 1
+            return True
+
+    @property
+    def last_time(self):
+        with self.lock:
+            return int(self.times[self._slot(self.size - 1)]) if self.size else None
+
+    def read(self, since=None):
+        """(version, times, values) in time order, optionally only rows after `since`."""
+        with self.lock:
+            order = self._slot(np.arange(self.size))
+            times = self.times[order]
+            values = self.values[order]
+            version = self.version
+        if since is not None:
+            keep = times > since
+            times, values = times[keep], values[keep]
+        return version, times, values
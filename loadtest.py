@@ -0,0 +1,445 @@
+"""End-to-end load test of the dashboard API under gunicorn.
+
+Starts a stand-in price upstream with configurable latency and error rate, seeds a
+price store from it once, then for every worker configuration boots
+`gunicorn api:app` against a copy of that store and replays N dashboard tabs. Like
+script.js a tab holds /api/startups/stream open and only polls (composition and
+chart on load, chart every 60 s) when the stream is refused; --stream-share 0
+makes every tab poll. Reports throughput, p50/p95/p99 latency, open and rejected
+streams and upstream calls per client request:
+
+    python loadtest.py --clients 200 --configs 1x16,4x16 --duration 120
+    python loadtest.py --clients 50 --interval 5 --upstream-latency 0.3 --upstream-errors 0.1
+    python loadtest.py --clients 40 --stream-share 0.5 --configs 1x16
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from providers import ReplayProvider
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+POLL_INTERVAL = 60 # script.js refreshes the chart every minute
+STREAM_RETRY = 5 # seconds, the stream's retry: field
+CHART_WIDTH = 1000 # pixels, sent as width= like script.js
+PERCENTILES = (50, 95, 99)
+
+
+# --- STAND-IN UPSTREAM ---
+
+class FakeUpstream:
+    """Synthetic price service for HttpProvider: ReplayProvider bars served over HTTP, each
+    call delayed by `latency` (plus up to `jitter`) seconds and failing with `error_rate`."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.replay = ReplayProvider(seed=seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self.tickers = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:%d" % self.server.server_port
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-upstream", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def counts(self):
+        with self.lock:
+            return {"calls": self.calls, "tickers": self.tickers, "errors": self.errors}
+
+    def reset(self):
+        with self.lock:
+            self.calls = self.tickers = self.errors = 0
+
+    def _respond(self, path, params):
+        tickers = [t for t in params.get("tickers", [""])[0].split(",") if t]
+        with self.lock:
+            self.calls += 1
+            self.tickers += len(tickers)
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        if random.random() < self.error_rate:
+            with self.lock:
+                self.errors += 1
+            return 503, {"error": "injected failure"}
+
+        if path == "/download":
+            frames = self.replay.download(tickers, params["start"][0], params["end"][0])
+            dates = next(iter(frames.values())).index if frames else []
+            return 200, {
+                "dates": [d.strftime("%Y-%m-%d") for d in dates],
+                "fields": {field: {t: frame[t].tolist() for t in frame.columns} for field, frame in frames.items()},
+            }
+        if path == "/intraday":
+            closes = self.replay.intraday(tickers)
+            return 200, {"times": closes.index.tolist(), "closes": {t: closes[t].tolist() for t in closes.columns}}
+        return 404, {"error": "not found"}
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                status, payload = upstream._respond(url.path, parse_qs(url.query))
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+# --- SERVER UNDER TEST ---
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_env(upstream, store_dir):
+    env = dict(os.environ, PRICE_PROVIDER="http", PRICE_UPSTREAM_URL=upstream.url, PRICE_STORE_DIR=store_dir)
+    env.pop("SHARED_CACHE_PATH", None)
+    return env
+
+
+def seed_store(upstream, store_dir, start=None):
+    """Backfills the template store once, without injected latency or failures."""
+    latency, jitter, error_rate = upstream.latency, upstream.jitter, upstream.error_rate
+    upstream.latency = upstream.jitter = upstream.error_rate = 0
+    command = [sys.executable, os.path.join(ROOT, "backfill.py"), "--rate", "1000"]
+    if start:
+        command += ["--start", start]
+    try:
+        subprocess.check_call(command,
+                              env=dict(server_env(upstream, store_dir), BACKGROUND_REFRESH="0"), cwd=ROOT,
+                              stdout=subprocess.DEVNULL)
+    finally:
+        upstream.latency, upstream.jitter, upstream.error_rate = latency, jitter, error_rate
+
+
+def start_server(upstream, store_dir, workers, threads, port):
+    return subprocess.Popen(
+        ["gunicorn", "api:app", "--preload", "--worker-class", "gthread", "--workers", str(workers),
+         "--threads", str(threads), "--bind", "127.0.0.1:%d" % port, "--log-level", "warning"],
+        env=server_env(upstream, store_dir), cwd=ROOT)
+
+
+def wait_ready(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+            conn.request("GET", "/api/startups/composition")
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+# --- CLIENTS ---
+
+class Client(threading.Thread):
+    """One dashboard tab: composition and chart on load, then the chart every `interval` seconds."""
+
+    def __init__(self, port, interval, stop_at, start_offset, results, width=CHART_WIDTH):
+        super().__init__(daemon=True)
+        self.port = port
+        self.interval = interval
+        self.stop_at = stop_at
+        self.start_offset = start_offset
+        self.results = results
+        self.conn = None
+        # getChartQuery(): a year back from today and the chart's width
+        self.query = "start=%s&width=%d" % ((datetime.today() - timedelta(days=365)).strftime("%Y-%m-%d"), width)
+        self.chart_url = "/api/startups/chart?" + self.query
+
+    def request(self, path):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        self.conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+        response = self.conn.getresponse()
+        response.read()
+        return response.status
+
+    def fetch(self, endpoint, path):
+        started = time.perf_counter()
+        reused = self.conn is not None
+        try:
+            try:
+                status = self.request(path)
+            except (OSError, http.client.HTTPException):
+                # The server closed an idle keep-alive connection: reconnect once, like a browser
+                if not reused:
+                    raise
+                self.conn.close()
+                self.conn = None
+                status = self.request(path)
+        except (OSError, http.client.HTTPException):
+            status = 0
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+        self.results.append((endpoint, status, time.perf_counter() - started))
+
+    def poll(self):
+        self.fetch("composition", "/api/startups/composition")
+        next_poll = time.monotonic()
+        while next_poll < self.stop_at:
+            self.fetch("chart", self.chart_url)
+            next_poll += self.interval
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+        if self.conn is not None:
+            self.conn.close()
+
+    def run(self):
+        time.sleep(self.start_offset)
+        self.poll()
+
+
+class StreamStats:
+    """Streams opened, refused and open at once, and events received, across all clients."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.opened = self.rejected = self.dropped = self.events = 0
+        self.open = self.peak = 0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+            self.peak = max(self.peak, self.open)
+
+    def summary(self):
+        with self.lock:
+            return {"opened": self.opened, "rejected": self.rejected, "dropped": self.dropped,
+                    "peak_open": self.peak, "events": self.events}
+
+
+class StreamClient(Client):
+    """A tab running startLiveStream(): holds /api/startups/stream open until the end of the
+    run, reconnects after the retry delay when the stream drops and falls back to polling
+    when the server refuses it. Records the time to the first (snapshot) event."""
+
+    def __init__(self, port, interval, stop_at, start_offset, results, stats, width=CHART_WIDTH):
+        super().__init__(port, interval, stop_at, start_offset, results, width)
+        self.stats = stats
+
+    def stream(self):
+        """Reads one stream until it ends or the run is over; False if it was refused."""
+        started = time.perf_counter()
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        try:
+            conn.request("GET", "/api/startups/stream?" + self.query, headers={"Accept": "text/event-stream"})
+            response = conn.getresponse()
+            if response.status != 200:
+                response.read()
+                self.results.append(("stream", response.status, time.perf_counter() - started))
+                self.stats.add(rejected=1)
+                return False
+            self.stats.add(opened=1, open=1)
+            first = True
+            try:
+                while time.monotonic() < self.stop_at:
+                    # Heartbeats arrive every 15 s, so a read never blocks much past the end
+                    conn.sock.settimeout(max(0.1, self.stop_at - time.monotonic()))
+                    line = response.readline()
+                    if not line:
+                        self.stats.add(dropped=1)
+                        break
+                    if line.startswith(b"event:"):
+                        self.stats.add(events=1)
+                        if first:
+                            self.results.append(("stream", 200, time.perf_counter() - started))
+                            first = False
+            except socket.timeout:
+                pass
+            finally:
+                self.stats.add(open=-1)
+            return True
+        except (OSError, http.client.HTTPException):
+            self.results.append(("stream", 0, time.perf_counter() - started))
+            return True
+        finally:
+            conn.close()
+
+    def run(self):
+        time.sleep(self.start_offset)
+        while time.monotonic() < self.stop_at:
+            if not self.stream():
+                self.poll()
+                return
+            if time.monotonic() < self.stop_at:
+                time.sleep(STREAM_RETRY)
+
+
+def summarize(results, elapsed):
+    latencies = np.array([seconds for _, _, seconds in results]) * 1000
+    ok = [status for _, status, _ in results if 200 <= status < 400]
+    row = {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "statuses": {str(status): sum(1 for _, s, _ in results if s == status) for status in sorted({s for _, s, _ in results})},
+        "throughput_rps": len(results) / elapsed if elapsed else 0.0,
+    }
+    for p in PERCENTILES:
+        row["p%d_ms" % p] = float(np.percentile(latencies, p)) if len(latencies) else None
+    return row
+
+
+def run_config(upstream, template, workers, threads, args):
+    store_dir = tempfile.mkdtemp(prefix="loadtest_store_")
+    shutil.copytree(template, store_dir, dirs_exist_ok=True)
+    port = free_port()
+    upstream.reset()
+    booted = time.perf_counter()
+    server = start_server(upstream, store_dir, workers, threads, port)
+    try:
+        if not wait_ready(port, args.boot_timeout):
+            raise RuntimeError("server with %d workers did not become ready" % workers)
+        boot = {"seconds": time.perf_counter() - booted, "upstream": upstream.counts()}
+
+        upstream.reset()
+        results = []
+        stats = StreamStats()
+        started = time.monotonic()
+        stop_at = started + args.duration
+        streaming = round(args.clients * args.stream_share)
+        clients = []
+        for i in range(args.clients):
+            # Tabs open spread over the first polling interval, like users arriving
+            offset = random.uniform(0, min(args.interval, args.duration))
+            if i < streaming:
+                clients.append(StreamClient(port, args.interval, stop_at, offset, results, stats, args.width))
+            else:
+                clients.append(Client(port, args.interval, stop_at, offset, results, args.width))
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.monotonic() - started
+        calls = upstream.counts()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+    row = {"workers": workers, "threads": threads, "clients": args.clients, "streaming_clients": streaming, "boot": boot}
+    row.update(summarize(results, elapsed))
+    row["streams"] = stats.summary()
+    row["endpoints"] = {endpoint: summarize([r for r in results if r[0] == endpoint], elapsed)
+                        for endpoint in sorted({r[0] for r in results})}
+    row["upstream"] = calls
+    row["amplification"] = calls["calls"] / row["requests"] if row["requests"] else 0.0
+    return row
+
+
+def print_row(row):
+    print("%2d x %-3d %5d clients  %7.1f req/s  p50 %7.1f  p95 %7.1f  p99 %7.1f ms  %4d errors  "
+          "%4d upstream calls (%.4f per request)" % (
+              row["workers"], row["threads"], row["clients"], row["throughput_rps"], row["p50_ms"] or 0,
+              row["p95_ms"] or 0, row["p99_ms"] or 0, row["errors"], row["upstream"]["calls"], row["amplification"]))
+    for endpoint, stats in row["endpoints"].items():
+        print("          %-12s %6d requests  p50 %7.1f  p95 %7.1f  p99 %7.1f ms" % (
+            endpoint, stats["requests"], stats["p50_ms"] or 0, stats["p95_ms"] or 0, stats["p99_ms"] or 0))
+    if row["streaming_clients"]:
+        streams = row["streams"]
+        print("          streams      %6d opened  %4d rejected  %4d dropped  %4d open at peak  %6d events" % (
+            streams["opened"], streams["rejected"], streams["dropped"], streams["peak_open"], streams["events"]))
+
+
+def parse_configs(value):
+    """"1x16,4x8" -> [(1, 16), (4, 8)] (workers x threads)."""
+    configs = []
+    for item in value.split(","):
+        workers, _, threads = item.partition("x")
+        configs.append((int(workers), int(threads or 16)))
+    return configs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100, help="simulated dashboard tabs")
+    parser.add_argument("--configs", type=parse_configs, default=parse_configs("1x16,2x16,4x16"),
+                        help="gunicorn workers x threads, comma separated")
+    parser.add_argument("--duration", type=float, default=180, help="seconds of load per configuration")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="chart polling interval in seconds")
+    parser.add_argument("--stream-share", type=float, default=1.0,
+                        help="fraction of tabs that open the live stream (the rest, and refused streams, poll)")
+    parser.add_argument("--width", type=int, default=CHART_WIDTH, help="chart width in pixels sent with chart requests")
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="seconds per upstream call")
+    parser.add_argument("--upstream-jitter", type=float, default=0.1, help="extra random seconds per upstream call")
+    parser.add_argument("--upstream-errors", type=float, default=0.0, help="fraction of upstream calls that fail")
+    parser.add_argument("--history-start", help="first day seeded into the store (default: the API's history start)")
+    parser.add_argument("--boot-timeout", type=float, default=120)
+    parser.add_argument("--out", help="results file (default loadtest_results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    upstream = FakeUpstream(args.upstream_latency, args.upstream_jitter, args.upstream_errors).start()
+    template = tempfile.mkdtemp(prefix="loadtest_seed_")
+    results = []
+    try:
+        print("Seeding the price store...")
+        seed_store(upstream, template, args.history_start)
+        for workers, threads in args.configs:
+            row = run_config(upstream, template, workers, threads, args)
+            print_row(row)
+            results.append(row)
+    finally:
+        upstream.stop()
+        shutil.rmtree(template, ignore_errors=True)
+
+    out = args.out or os.path.join("loadtest_results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "meta": {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "duration_s": args.duration,
+                "interval_s": args.interval,
+                "stream_share": args.stream_share,
+                "width": args.width,
+                "upstream": {"latency_s": args.upstream_latency, "jitter_s": args.upstream_jitter,
+                             "error_rate": args.upstream_errors},
+            },
+            "results": results,
+        }, f, indent=2)
+    print("Saved %d results to %s" % (len(results), out))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Process-local metrics in the Prometheus text format.
+# Counters and histograms are keyed by label values; `stage()` times a block into the
+# stage histogram and, when the current request asked for it, into a per-request profile
+# that is returned as a Server-Timing header.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REGISTRY = []
+_profile = threading.local()
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (n, str(v).replace('"', '\\"')) for n, v in zip(names, values))
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.documentation), "# TYPE %s counter" % self.name]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append("%s%s %s" % (self.name, _labels(self.labelnames, key), value))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # key -> [bucket counts..., count, sum]
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self.lock:
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.documentation), "# TYPE %s histogram" % self.name]
+        names = self.labelnames + ("le",)
+        with self.lock:
+            for key, row in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, row):
+                    lines.append("%s_bucket%s %d" % (self.name, _labels(names, key + (repr(float(bound)),)), count))
+                lines.append("%s_bucket%s %d" % (self.name, _labels(names, key + ("+Inf",)), row[-2]))
+                lines.append("%s_count%s %d" % (self.name, _labels(self.labelnames, key), row[-2]))
+                lines.append("%s_sum%s %.6f" % (self.name, _labels(self.labelnames, key), row[-1]))
+        return lines
+
+
+def render():
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# --- METRICS ---
+
+STAGE_SECONDS = Histogram("startup_stage_seconds", "Time spent per processing stage", ["stage"])
+REQUEST_SECONDS = Histogram("startup_request_seconds", "Request latency per endpoint", ["endpoint", "status"])
+RESPONSE_BYTES = Histogram("startup_response_bytes", "Response body size per endpoint", ["endpoint"], buckets=SIZE_BUCKETS)
+UPSTREAM_SECONDS = Histogram("startup_upstream_seconds", "Upstream download latency", ["provider", "kind"])
+UPSTREAM_CALLS = Counter("startup_upstream_calls_total", "Upstream downloads by outcome", ["provider", "kind", "outcome"])
+UPSTREAM_RETRIES = Counter("startup_upstream_retries_total", "Upstream calls retried after a failure", ["provider"])
+UPSTREAM_CIRCUIT_OPENS = Counter("startup_upstream_circuit_opens_total", "Times the upstream circuit breaker opened")
+STREAMS_REJECTED = Counter("startup_streams_rejected_total", "Live streams refused because every stream slot was taken")
+CACHE_REQUESTS = Counter("startup_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+
+
+def cache_lookup(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+# --- PER-REQUEST PROFILE ---
+
+def start_profile():
+    _profile.stages = []
+
+
+def end_profile():
+    """Stages recorded since start_profile() as a Server-Timing header value, None if not profiling."""
+    stages = getattr(_profile, "stages", None)
+    _profile.stages = None
+    if stages is None:
+        return None
+    return ", ".join("%s;dur=%.2f" % (name, seconds * 1000) for name, seconds in stages)
+
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        stages = getattr(_profile, "stages", None)
+        if stages is not None:
+            stages.append((name, elapsed))
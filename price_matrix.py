@@ -0,0 +1,122 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from row_buffer import RowBuffer
+
+# Resident price matrix.
+# The stored frames are copied once per store generation into contiguous (dates x tickers)
+# float arrays on the store's trading calendar: closing prices are forward filled and
+# every date is formatted once. Requests find their window with a binary search and read
+# views, so what they allocate grows with the response, not with the stored history.
+# The arrays live in growable buffers: the next generation, which normally only revises
+# the last day and appends new ones, is made by writing those rows, without changing a
+# row an older matrix still serves (see row_buffer.py).
+
+FILLED_FIELDS = ("Close", "Adj Close")
+
+
+def forward_fill(values):
+    """Forward fills NaNs down the rows of a 2-D array in place; leading NaNs stay."""
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    values[:] = values[rows, np.arange(values.shape[1])]
+    return values
+
+
+class PriceMatrix:
+    def __init__(self, frames, generation=None):
+        first = next(iter(frames.values()), None)
+        self.generation = generation
+        dates = first.index if first is not None else pd.DatetimeIndex([])
+        self.tickers = list(first.columns) if first is not None else []
+        self.columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.field = 'Adj Close' if 'Adj Close' in frames else 'Close'
+        values = {field: frame.to_numpy(dtype=float) for field, frame in frames.items()}
+
+        # Row of the last real bar per ticker, -1 if it never traded
+        prices = values.get(self.field, np.empty((0, 0)))
+        valid = ~np.isnan(prices)
+        self.last_valid = np.where(valid.any(axis=0), len(prices) - 1 - np.argmax(valid[::-1], axis=0), -1)
+
+        # (buffer, slot) per field
+        self.buffers = {field: (RowBuffer(array), 0) for field, array in values.items()}
+        self.buffers['dates'] = (RowBuffer(np.asarray(dates)), 0)
+        self.buffers['labels'] = (RowBuffer(np.asarray(dates.strftime('%Y-%m-%d'), dtype=object)), 0)
+        self._attach(len(dates))
+        for field in FILLED_FIELDS:
+            if field in self.values:
+                forward_fill(self.values[field])
+
+    def _attach(self, n):
+        views = {field: buffer.attach(self, slot, n) for field, (buffer, slot) in self.buffers.items()}
+        self.dates = pd.DatetimeIndex(views.pop('dates'), copy=False)
+        self.labels = views.pop('labels')
+        self.values = views
+
+    def extended(self, frames, generation, changed_from):
+        """Matrix of `frames` that only converts the rows from `changed_from` on, or None when
+        the rows before it moved (other tickers or fields, history prepended)."""
+        first = next(iter(frames.values()), None)
+        if first is None or list(first.columns) != self.tickers or set(frames) != set(self.values):
+            return None
+        start = self.row(changed_from)
+        if start == 0 or int(first.index.searchsorted(changed_from)) != start or first.index[start - 1] != self.dates[start - 1]:
+            return None
+
+        rows = {field: frame.iloc[start:].to_numpy(dtype=float) for field, frame in frames.items()}
+        valid = ~np.isnan(rows[self.field])
+        traded = valid.any(axis=0)
+        if (self.last_valid[~traded] >= start).any():
+            # A revision removed a ticker's last bar; finding the one before needs a rebuild
+            return None
+        for field in FILLED_FIELDS:
+            if field in rows:
+                rows[field] = forward_fill(np.vstack([self.values[field][start - 1], rows[field]]))[1:]
+        dates = first.index[start:]
+        rows['dates'] = np.asarray(dates)
+        rows['labels'] = np.asarray(dates.strftime('%Y-%m-%d'), dtype=object)
+
+        matrix = copy.copy(self)
+        matrix.generation = generation
+        matrix.buffers = {field: buffer.write(matrix, slot, len(self), start, rows[field])
+                          for field, (buffer, slot) in self.buffers.items()}
+        matrix.last_valid = np.where(traded, start + len(valid) - 1 - np.argmax(valid[::-1], axis=0), self.last_valid)
+        matrix._attach(start + len(dates))
+        return matrix
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for view in ('dates', 'labels', 'values'):
+            del state[view]
+        state['n'] = len(self.dates)
+        return state
+
+    def __setstate__(self, state):
+        n = state.pop('n')
+        self.__dict__.update(state)
+        self._attach(n)
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def prices(self):
+        """Forward-filled closes (adjusted when stored), dates x tickers."""
+        return self.values[self.field]
+
+    def row(self, date):
+        """First row on or after `date`."""
+        return int(self.dates.searchsorted(pd.Timestamp(date), side='left'))
+
+    def window(self, start=None, end=None):
+        """(lo, hi) rows of the dates in [start, end], either bound optional."""
+        lo = self.row(start) if start is not None else 0
+        hi = int(self.dates.searchsorted(pd.Timestamp(end), side='right')) if end is not None else len(self.dates)
+        return lo, max(lo, hi)
+
+    def positions(self, tickers):
+        """(tickers present in the matrix, their column positions) in the given order."""
+        present = [t for t in tickers if t in self.columns]
+        return present, np.array([self.columns[t] for t in present], dtype=int)
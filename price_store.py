@@ -0,0 +1,360 @@
+import os
+import json
+import glob
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from providers import FIELDS, YahooProvider
+from upstream import UpstreamUnavailable
+
+try:
+    import fcntl
+except ImportError: # Windows: single process only, no cross-process locking
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# Columnar on-disk price store.
+# One .npy matrix (dates x tickers) per OHLCV field, plus a shared date axis and a
+# manifest listing the tickers. Files are written under a generation number and the
+# manifest is swapped in last, so readers never see a half written store. Several processes
+# (gunicorn workers) can share one store: writers take an exclusive file lock and first
+# reload whatever another process saved.
+
+
+def _field_file(field):
+    return field.lower().replace(" ", "_")
+
+
+def _to_timestamp(value):
+    return pd.Timestamp(value).normalize()
+
+
+class PriceStore:
+    def __init__(self, path, history_start, refresh_interval=60, provider=None,
+                 workers=4, chunk_size=5, timeout=10.0):
+        self.path = path
+        self.history_start = _to_timestamp(history_start)
+        self.refresh_interval = refresh_interval
+        self.provider = provider or YahooProvider()
+        # Upstream downloads run chunk-wise on a bounded pool with a deadline per refresh
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upstream")
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.stale_tickers = set()
+        self.lock = threading.Lock()
+        self.covered_from = None
+        self.generation = 0
+        self.last_refresh = 0.0
+        self.saved_at = 0.0
+        # (generation, first changed date) of the last save; None means everything may have changed
+        self.last_change = (0, None)
+        self._frames = None
+        self._manifest_mtime = None
+
+    # --- DISK ---
+
+    def _manifest_path(self):
+        return os.path.join(self.path, "manifest.json")
+
+    def _load(self):
+        try:
+            with open(self._manifest_path()) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        self._manifest_mtime = self._stat_manifest()
+        gen = manifest['generation']
+        base = os.path.join(self.path, "%s.%d.npy")
+        dates = np.load(base % ("dates", gen)).astype('datetime64[ns]')
+        index = pd.DatetimeIndex(dates)
+        frames = {}
+        for field in manifest['fields']:
+            values = np.load(base % (_field_file(field), gen), mmap_mode='r')
+            frames[field] = pd.DataFrame(values, index=index, columns=manifest['tickers'])
+        self.generation = gen
+        self.covered_from = pd.Timestamp(manifest['covered_from'])
+        self.last_refresh = manifest.get('refreshed_at', 0.0)
+        self.saved_at = manifest.get('saved_at', 0.0)
+        return frames
+
+    def _save(self, frames):
+        os.makedirs(self.path, exist_ok=True)
+        gen = self.generation + 1
+        base = os.path.join(self.path, "%s.%d.npy")
+
+        def write(name, array):
+            tmp = (base % (name, gen)) + ".tmp"
+            with open(tmp, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp, base % (name, gen))
+
+        reference = next(iter(frames.values()))
+        write("dates", reference.index.values.astype('datetime64[D]'))
+        for field, frame in frames.items():
+            write(_field_file(field), np.ascontiguousarray(frame.to_numpy(dtype=float)))
+
+        manifest = {
+            "generation": gen,
+            "tickers": list(reference.columns),
+            "fields": list(frames.keys()),
+            "covered_from": self.covered_from.strftime("%Y-%m-%d"),
+            "refreshed_at": self.last_refresh,
+            "saved_at": time.time(),
+        }
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path())
+        self._manifest_mtime = self._stat_manifest()
+        self.generation = gen
+        self.saved_at = manifest['saved_at']
+
+        # Keep the previous generation around for readers that are mid-load
+        for stale in glob.glob(os.path.join(self.path, "*.npy")):
+            try:
+                if int(stale.rsplit(".", 2)[1]) < gen - 1:
+                    os.remove(stale)
+            except (ValueError, OSError):
+                pass
+
+    def _stat_manifest(self):
+        try:
+            return os.stat(self._manifest_path()).st_mtime_ns
+        except OSError:
+            return None
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "store.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def changed_on_disk(self):
+        """True when another process saved a newer generation than the one in memory."""
+        return self._stat_manifest() != self._manifest_mtime
+
+    def reload(self):
+        """Picks up a generation saved by another process; returns True if there was one."""
+        if self._frames is not None and not self.changed_on_disk():
+            return False
+        frames = self._load()
+        if frames is None:
+            return False
+        self._frames = frames
+        # Unknown what changed, dependants rebuild from scratch
+        self.last_change = (self.generation, None)
+        return True
+
+    # --- MERGE ---
+
+    def _merge(self, frames, fetched, tickers):
+        """Merges fetched bars into frames; also returns the first changed date (None if unchanged)."""
+        if not fetched:
+            return frames, None
+
+        merged = {}
+        changed_from = None
+        for field in FIELDS:
+            new = fetched.get(field)
+            old = frames.get(field) if frames else None
+            if new is None and old is None:
+                continue
+            if old is None:
+                combined = new
+            elif new is None:
+                combined = old
+            else:
+                # Fresh bars win over stored ones (the last bar may have been partial)
+                combined = new.combine_first(old)
+            # Remember tickers that returned nothing so they are not re-fetched on every call
+            missing = [t for t in tickers if t not in combined.columns]
+            if missing:
+                combined = combined.reindex(columns=list(combined.columns) + missing)
+            combined = combined.sort_index()
+            # Re-fetching the last bar usually returns what we already have
+            if old is None or list(combined.columns) != list(old.columns):
+                first = combined.index[0]
+            elif combined.shape != old.shape or not combined.reindex(index=old.index, columns=old.columns).equals(old):
+                first = new.index[0] if new is not None else combined.index[0]
+            else:
+                first = None
+            if first is not None:
+                changed_from = first if changed_from is None else min(changed_from, first)
+            merged[field] = combined
+        return merged, changed_from
+
+    def _apply(self, frames, completed):
+        """Merges (tickers, fetched) pairs; returns the frames and the first changed date."""
+        changed_from = None
+        for job_tickers, fetched in completed:
+            frames, job_changed = self._merge(frames, fetched, job_tickers)
+            if job_changed is not None:
+                changed_from = job_changed if changed_from is None else min(changed_from, job_changed)
+        return frames, changed_from
+
+    def _commit(self, frames, changed_from):
+        if changed_from is not None:
+            self._save(frames)
+            self._frames = frames
+            self.last_change = (self.generation, changed_from)
+
+    # --- UPSTREAM ---
+
+    def _download(self, tickers, start, end):
+        labels = {"provider": self.provider.name, "kind": "daily"}
+        started = time.perf_counter()
+        try:
+            frames = self.provider.download(tickers, start, end)
+        except UpstreamUnavailable:
+            metrics.UPSTREAM_CALLS.inc(outcome="rejected", **labels)
+            raise
+        except Exception:
+            metrics.UPSTREAM_CALLS.inc(outcome="error", **labels)
+            raise
+        finally:
+            metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - started, **labels)
+        metrics.UPSTREAM_CALLS.inc(outcome="ok", **labels)
+        return frames
+
+    def _fetch(self, jobs):
+        """Runs (tickers, start, end) jobs in chunks on the pool.
+
+        Returns the (tickers, frames) pairs that finished before the deadline and the
+        tickers whose chunk failed or missed it.
+        """
+        futures = {}
+        for job_tickers, job_start, job_end in jobs:
+            for i in range(0, len(job_tickers), self.chunk_size):
+                chunk = job_tickers[i:i + self.chunk_size]
+                futures[self.pool.submit(self._download, chunk, job_start, job_end)] = chunk
+
+        done, pending = wait(futures, timeout=self.timeout)
+        completed, missed = [], []
+        for future in pending:
+            future.cancel()
+            missed.extend(futures[future])
+            metrics.UPSTREAM_CALLS.inc(provider=self.provider.name, kind="daily", outcome="timeout")
+        for future in done:
+            try:
+                completed.append((futures[future], future.result()))
+            except UpstreamUnavailable as e:
+                log.debug("Skipped upstream download for %s: %s", futures[future], e)
+                missed.extend(futures[future])
+            except Exception:
+                log.exception("Upstream download failed for %s", futures[future])
+                missed.extend(futures[future])
+        if missed:
+            log.warning("Serving stale data for %d tickers", len(set(missed)))
+        return completed, missed
+
+    # --- PUBLIC API ---
+
+    @property
+    def stale(self):
+        return bool(self.stale_tickers)
+
+    def frames(self):
+        if self._frames is None:
+            self._frames = self._load() or {}
+        return self._frames
+
+    def view(self):
+        """(frames, generation, first changed date of that generation, saved_at) read together,
+        for callers that derive several things from one generation. Saves replace the frames
+        dict instead of mutating it, so the returned frames stay consistent."""
+        with self.lock:
+            frames = self.frames()
+            generation, changed_from = self.last_change
+            return frames, self.generation, changed_from if generation == self.generation else None, self.saved_at
+
+    def ensure(self, tickers, start, end, refresh=True):
+        """Makes sure [start, end] is stored for tickers, fetching only the missing bars.
+
+        With refresh=False the latest bars are not re-fetched, only missing tickers and
+        history (for processes that leave the periodic refresh to another one).
+        """
+        start = min(_to_timestamp(start), self.history_start)
+        end = _to_timestamp(end)
+        fetch_end = end + timedelta(days=1)
+
+        with self.lock, self._file_lock():
+            self.reload()
+            frames = self.frames()
+            jobs = []
+            if not frames:
+                jobs.append((list(tickers), start, fetch_end))
+            else:
+                # covered_from is the earliest date requested so far, not the first bar,
+                # which may fall after a holiday
+                first = self.covered_from
+                last = next(iter(frames.values())).index[-1]
+                stored = next(iter(frames.values())).columns
+                known = [t for t in tickers if t in stored]
+                new = [t for t in tickers if t not in stored]
+
+                if new:
+                    jobs.append((new, min(start, first), max(fetch_end, last + timedelta(days=1))))
+                if known and start < first:
+                    jobs.append((known, start, first))
+                if refresh and known and end > last and time.time() - self.last_refresh >= self.refresh_interval:
+                    # Re-fetch the last stored bar as well, it may have been an intraday snapshot
+                    jobs.append((known, last, fetch_end))
+
+            if not jobs:
+                return frames
+
+            completed, missed = self._fetch(jobs)
+            frames, changed_from = self._apply(frames, completed)
+
+            self.last_refresh = time.time()
+            self.stale_tickers = set(missed)
+            if not missed or self.covered_from is None:
+                # Tickers that missed a fresh store come back as new tickers next time
+                self.covered_from = min(start, self.covered_from or start)
+            self._commit(frames, changed_from)
+            return self._frames
+
+    def write(self, completed, covered_from=None):
+        """Merges (tickers, frames) pairs downloaded elsewhere, e.g. by a backfill, and saves
+        them as one generation. `covered_from` is set once history from that date is complete."""
+        with self.lock, self._file_lock():
+            self.reload()
+            frames, changed_from = self._apply(self.frames(), completed)
+            if self.covered_from is None and frames:
+                # A partial backfill into an empty store guarantees no complete history yet
+                self.covered_from = next(iter(frames.values())).index[-1] + timedelta(days=1)
+            if covered_from is not None and frames and (self.covered_from is None or _to_timestamp(covered_from) < self.covered_from):
+                self.covered_from = _to_timestamp(covered_from)
+                if changed_from is None:
+                    # Nothing new to store, but the manifest has to record the coverage
+                    changed_from = next(iter(frames.values())).index[0]
+            self._commit(frames, changed_from)
+            return self._frames
+
+    def prices(self, tickers, start, end, field='Adj Close'):
+        """Returns a [start, end] price frame for tickers, filling the store as needed."""
+        frames = self.ensure(tickers, start, end)
+        if not frames:
+            return pd.DataFrame()
+        if field not in frames:
+            field = 'Close'
+        frame = frames[field]
+        columns = [t for t in tickers if t in frame.columns]
+        return frame.loc[_to_timestamp(start):_to_timestamp(end), columns]
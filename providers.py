@@ -0,0 +1,254 @@
+import json
+import os
+import time
+import zlib
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import numpy as np
+import pandas as pd
+
+# Price providers.
+# Everything that needs daily bars goes through PriceProvider.download(), which returns
+# {field: DataFrame[date x ticker]}; minute bars of the current session come from
+# PriceProvider.intraday() as a DataFrame[epoch seconds x ticker] of closes. YahooProvider is the live source, ReplayProvider
+# serves recorded or generated panels offline for tests, profiling and load tests, and
+# HttpProvider talks to a price service over HTTP (e.g. the stand-in upstream in loadtest.py).
+
+FIELDS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+
+def _to_timestamp(value):
+    return pd.Timestamp(value).normalize()
+
+
+def split_fields(raw, tickers):
+    """Turns a yf.download frame into {field: DataFrame[date x ticker]}."""
+    frames = {}
+    if raw is None or raw.empty:
+        return frames
+
+    index = pd.DatetimeIndex(raw.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    index = index.normalize()
+
+    for field in FIELDS:
+        if isinstance(raw.columns, pd.MultiIndex):
+            if field not in raw.columns.get_level_values(0):
+                continue
+            frame = raw[field]
+        else:
+            # Single ticker download without a ticker level
+            if field not in raw.columns:
+                continue
+            frame = raw[[field]].set_axis(list(tickers[:1]), axis=1)
+        frame = frame.astype(float)
+        frame.index = index
+        frames[field] = frame[~frame.index.duplicated(keep='last')]
+    return frames
+
+
+def synthetic_bars(n_days, n_tickers, seed=0):
+    """Random-walk OHLCV arrays of shape (n_days, n_tickers), deterministic for a seed.
+
+    Each quantity has its own random stream, so a longer panel extends a shorter one
+    generated with the same seed instead of reshuffling it.
+    """
+    streams = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(6)]
+    shape = (n_days, n_tickers)
+    start = streams[0].uniform(50, 2000, size=n_tickers)
+    close = start * np.exp(np.cumsum(streams[1].normal(0.0003, 0.02, size=shape), axis=0))
+    prev_close = np.vstack([start, close[:-1]])
+    open_ = prev_close * (1 + streams[2].normal(0, 0.005, size=shape))
+    high = np.maximum(open_, close) * (1 + np.abs(streams[3].normal(0, 0.01, size=shape)))
+    low = np.minimum(open_, close) * (1 - np.abs(streams[4].normal(0, 0.01, size=shape)))
+    volume = np.round(streams[5].lognormal(13, 1, size=shape))
+    return {"Open": open_, "High": high, "Low": low, "Close": close, "Adj Close": close, "Volume": volume}
+
+
+def synthetic_panel(n_tickers, n_days, seed=0, end=None):
+    """Generated N tickers x M business days panel ending at `end` (defaults to today)."""
+    end = _to_timestamp(end or pd.Timestamp.today())
+    index = pd.bdate_range(end=end, periods=n_days)
+    tickers = ["SYN%04d.NS" % i for i in range(n_tickers)]
+    bars = synthetic_bars(n_days, n_tickers, seed)
+    return {field: pd.DataFrame(values, index=index, columns=tickers) for field, values in bars.items()}
+
+
+def save_panel(panel, path):
+    """Records a panel (e.g. a live download) so ReplayProvider can serve it later."""
+    pd.to_pickle(panel, path)
+
+
+def load_panel(path):
+    return pd.read_pickle(path)
+
+
+class PriceProvider:
+    name = "base"
+
+    def download(self, tickers, start, end):
+        """Daily bars for tickers in [start, end) as {field: DataFrame[date x ticker]}."""
+        raise NotImplementedError
+
+    def intraday(self, tickers):
+        """Minute closes of the current (or most recent) session as DataFrame[epoch seconds x ticker]."""
+        raise NotImplementedError
+
+
+class YahooProvider(PriceProvider):
+    """Live Yahoo Finance bars.
+
+    Downloads go through Ticker.history one ticker at a time: yf.download keeps its
+    results in module globals and is not safe to call from several threads at once.
+    """
+    name = "yahoo"
+
+    def download(self, tickers, start, end):
+        import yfinance as yf
+        start = _to_timestamp(start).strftime("%Y-%m-%d")
+        end = _to_timestamp(end).strftime("%Y-%m-%d")
+        history = {}
+        for ticker in tickers:
+            bars = yf.Ticker(ticker).history(start=start, end=end, auto_adjust=False, actions=False)
+            if not bars.empty:
+                # Exchange-local dates, so tickers from different time zones line up
+                if bars.index.tz is not None:
+                    bars.index = bars.index.tz_localize(None)
+                history[ticker] = bars
+        if not history:
+            return {}
+        raw = pd.concat(history, axis=1).swaplevel(axis=1)
+        return split_fields(raw, list(tickers))
+
+    def intraday(self, tickers):
+        import yfinance as yf
+        closes = {}
+        for ticker in tickers:
+            bars = yf.Ticker(ticker).history(period="1d", interval="1m", auto_adjust=False, actions=False)
+            if not bars.empty:
+                closes[ticker] = pd.Series(bars['Close'].to_numpy(dtype=float), index=bars.index.as_unit("s").asi8)
+        return pd.DataFrame(closes).sort_index()
+
+
+class ReplayProvider(PriceProvider):
+    """Offline provider serving a recorded panel, or synthetic bars for any ticker.
+
+    Without a panel every ticker gets its own random walk on a fixed business-day
+    calendar starting at `epoch`, seeded from the ticker name, so repeated and
+    overlapping requests always agree. `latency` seconds are slept per call.
+    """
+    name = "replay"
+
+    def __init__(self, panel=None, latency=0.0, seed=0, epoch="2010-01-01"):
+        self.panel = panel
+        self.latency = latency
+        self.seed = seed
+        self.epoch = _to_timestamp(epoch)
+        self.calls = 0
+        self._generated = {}
+
+    def _bars(self, ticker, n_days):
+        bars = self._generated.get(ticker)
+        if bars is None or len(bars["Close"]) < n_days:
+            bars = synthetic_bars(n_days, 1, seed=zlib.crc32(ticker.encode()) ^ self.seed)
+            bars = {field: values[:, 0] for field, values in bars.items()}
+            self._generated[ticker] = bars
+        return bars
+
+    def download(self, tickers, start, end):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        start, end = _to_timestamp(start), _to_timestamp(end)
+        if self.panel is not None:
+            frames = {}
+            for field, frame in self.panel.items():
+                columns = [t for t in tickers if t in frame.columns]
+                window = frame.loc[(frame.index >= start) & (frame.index < end), columns]
+                if not window.empty:
+                    frames[field] = window
+            return frames
+
+        calendar = pd.bdate_range(self.epoch, max(end, pd.Timestamp.today().normalize()))
+        mask = (calendar >= start) & (calendar < end)
+        if not mask.any():
+            return {}
+        columns = {field: {} for field in FIELDS}
+        for ticker in tickers:
+            bars = self._bars(ticker, len(calendar))
+            for field in FIELDS:
+                columns[field][ticker] = bars[field][:len(calendar)][mask]
+        return {field: pd.DataFrame(values, index=calendar[mask]) for field, values in columns.items()}
+
+    def intraday(self, tickers, now=None):
+        """Minute random walks from each ticker's last synthetic close, up to `now` in the
+        current session or for the whole of the last session outside market hours."""
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        now = pd.Timestamp(now or pd.Timestamp.now(tz="UTC")).tz_convert("Asia/Kolkata")
+        day = now.normalize()
+        while day.weekday() >= 5 or now < day + pd.Timedelta(hours=9, minutes=15):
+            day -= pd.Timedelta(days=1)
+            now = day + pd.Timedelta(hours=15, minutes=30)
+        minutes = pd.date_range(day + pd.Timedelta(hours=9, minutes=15), min(now, day + pd.Timedelta(hours=15, minutes=29)), freq="min")
+        session = pd.bdate_range(self.epoch, day.tz_localize(None))
+
+        closes = {}
+        for ticker in tickers:
+            previous = self._bars(ticker, len(session))["Close"][len(session) - 2]
+            rng = np.random.default_rng([zlib.crc32(ticker.encode()) ^ self.seed, day.toordinal()])
+            closes[ticker] = previous * np.exp(np.cumsum(rng.normal(0, 0.0015, size=len(minutes))))
+        return pd.DataFrame(closes, index=minutes.as_unit("s").asi8)
+
+
+class HttpProvider(PriceProvider):
+    """Bars from an HTTP price service speaking JSON:
+
+        GET /download?tickers=A,B&start=YYYY-MM-DD&end=YYYY-MM-DD
+            -> {"dates": [...], "fields": {field: {ticker: [values]}}}
+        GET /intraday?tickers=A,B
+            -> {"times": [epoch seconds], "closes": {ticker: [values]}}
+
+    Non-2xx answers raise, so failures reach the upstream client's retries and breaker.
+    """
+    name = "http"
+
+    def __init__(self, base_url, timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _get(self, path, **params):
+        with urlopen("%s%s?%s" % (self.base_url, path, urlencode(params)), timeout=self.timeout) as response:
+            return json.load(response)
+
+    def download(self, tickers, start, end):
+        data = self._get("/download", tickers=",".join(tickers),
+                         start=_to_timestamp(start).strftime("%Y-%m-%d"), end=_to_timestamp(end).strftime("%Y-%m-%d"))
+        if not data["dates"]:
+            return {}
+        index = pd.DatetimeIndex(data["dates"])
+        return {field: pd.DataFrame(columns, index=index, dtype=float) for field, columns in data["fields"].items()}
+
+    def intraday(self, tickers):
+        data = self._get("/intraday", tickers=",".join(tickers))
+        return pd.DataFrame(data["closes"], index=pd.Index(data["times"], dtype="int64"), dtype=float)
+
+
+def get_provider():
+    """Provider selected by PRICE_PROVIDER (yahoo | replay | http)."""
+    name = os.environ.get("PRICE_PROVIDER", "yahoo").lower()
+    if name == "replay":
+        path = os.environ.get("REPLAY_PANEL")
+        return ReplayProvider(
+            panel=load_panel(path) if path else None,
+            latency=float(os.environ.get("REPLAY_LATENCY", "0")),
+            seed=int(os.environ.get("REPLAY_SEED", "0")),
+        )
+    if name == "http":
+        return HttpProvider(os.environ["PRICE_UPSTREAM_URL"], timeout=float(os.environ.get("PRICE_UPSTREAM_TIMEOUT", "30")))
+    return YahooProvider()
@@ -0,0 +1,85 @@
+import threading
+import weakref
+
+import numpy as np
+
+# Growable day-by-day arrays.
+# Index levels, prices and the price matrix only change at their end: a refresh revises
+# the last stored day(s) and appends new ones. A RowBuffer keeps spare rows after the
+# data so those days are written without copying the history; readers (IndexState,
+# PriceMatrix) register and hold views of their first n rows.
+# A row a live reader can see is never rewritten. The buffer has two slots: a refresh
+# that revises the last day of the snapshot being served writes into the other slot,
+# after copying over the rows changed since that slot was last written (a day or two).
+# Only when both slots are still read past the first revised row, or the rows no longer
+# fit, is the history copied into a new buffer with room for as many rows again.
+
+SPARE_ROWS = 256 # about a year of trading days before the first copy
+
+
+class RowBuffer:
+    """Two slots of rows with spare capacity; readers register the slot and rows they view."""
+
+    def __init__(self, rows, spare=SPARE_ROWS):
+        rows = np.asarray(rows)
+        self.slots = [np.empty((len(rows) + spare,) + rows.shape[1:], dtype=rows.dtype), None]
+        self.slots[0][:len(rows)] = rows
+        # Leading rows both slots hold
+        self.shared = 0
+        self.readers = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+
+    def attach(self, reader, slot, n):
+        """View of the first `n` rows of `slot`, kept unchanged while `reader` is alive."""
+        with self.lock:
+            self.readers[reader] = (slot, n)
+        return self.slots[slot][:n]
+
+    def _pinned(self, slot, start):
+        return any(s == slot and n > start for s, n in self.readers.values())
+
+    def write(self, reader, slot, n, start, rows):
+        """(buffer, slot) holding the first `start` of the `n` rows viewed in `slot` followed
+        by `rows`, registered for `reader` (the new state viewing them)."""
+        rows = np.asarray(rows, dtype=self.slots[0].dtype)
+        end = start + len(rows)
+        with self.lock:
+            for target in (slot, 1 - slot):
+                data = self.slots[target]
+                if data is None:
+                    data = self.slots[target] = np.empty_like(self.slots[slot])
+                # The other slot first catches up from the last row both slots hold
+                lo = start if target == slot else min(self.shared, start)
+                if end > len(data) or self._pinned(target, lo):
+                    continue
+                if target == slot:
+                    self.shared = min(self.shared, start)
+                else:
+                    data[lo:start] = self.slots[slot][lo:start]
+                    self.shared = start
+                data[start:end] = rows
+                self.readers[reader] = (target, end)
+                return self, target
+        # The rows before `start` belong to a live reader, so they do not change meanwhile
+        grown = RowBuffer(self.slots[slot][:start], spare=max(end, SPARE_ROWS))
+        grown.slots[0][start:end] = rows
+        grown.readers[reader] = (0, end)
+        return grown, 0
+
+    def __getstate__(self):
+        # Only the rows someone reads; readers attach again when they are unpickled
+        with self.lock:
+            extent = [max((n for s, n in self.readers.values() if s == slot), default=0) for slot in (0, 1)]
+            slots = [None if data is None or not extent[slot] else data[:extent[slot]]
+                     for slot, data in enumerate(self.slots)]
+            if slots[0] is None:
+                slots[0] = self.slots[0][:0]
+            return {"slots": slots, "shared": min([self.shared] + extent)}
+
+    def __setstate__(self, state):
+        first, second = state["slots"]
+        self.__init__(first)
+        if second is not None:
+            self.slots[1] = np.empty((len(second) + SPARE_ROWS,) + second.shape[1:], dtype=second.dtype)
+            self.slots[1][:len(second)] = second
+        self.shared = state["shared"]
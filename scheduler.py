@@ -0,0 +1,146 @@
+import os
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+try:
+    import fcntl
+except ImportError: # Windows: no leader election, every process refreshes
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# NSE cash session, Monday to Friday
+IST = timezone(timedelta(hours=5, minutes=30))
+MARKET_OPEN = (9, 15)
+MARKET_CLOSE = (15, 30)
+
+
+def market_is_open(now=None):
+    now = (now or datetime.now(timezone.utc)).astimezone(IST)
+    if now.weekday() >= 5:
+        return False
+    return MARKET_OPEN <= (now.hour, now.minute) < MARKET_CLOSE
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one computation per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+
+class RefreshScheduler:
+    """Background thread running `job` every `open_interval` seconds while the market
+    is open and every `closed_interval` seconds otherwise."""
+
+    def __init__(self, job, open_interval=60, closed_interval=900):
+        self.job = job
+        self.open_interval = open_interval
+        self.closed_interval = closed_interval
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def interval(self):
+        return self.open_interval if market_is_open() else self.closed_interval
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                self.job()
+            except Exception:
+                log.exception("Background refresh failed")
+            self.stopped.wait(self.interval())
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.stopped.clear()
+                self.thread = threading.Thread(target=self._run, name="refresh-scheduler", daemon=True)
+                self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            thread.join()
+
+
+class LeaderLock:
+    """Non-blocking exclusive file lock that elects one refreshing process among workers.
+
+    The lock is held until the process exits, so when the leader dies the next
+    acquire() in another worker takes over.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.attempted = False
+        self.lock = threading.Lock()
+
+    @property
+    def held(self):
+        return self.file is not None
+
+    @property
+    def follower(self):
+        """True once an election was lost; processes that never ran one act on their own."""
+        return self.attempted and self.file is None
+
+    def acquire(self):
+        with self.lock:
+            self.attempted = True
+            if self.file is not None:
+                return True
+            if fcntl is None:
+                self.file = True
+                return True
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            f = open(self.path, "a+")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+            f.seek(0)
+            f.truncate()
+            f.write(str(os.getpid()))
+            f.flush()
+            self.file = f
+            log.info("Process %d is the refresh leader", os.getpid())
+            return True
@@ -154,15 +154,42 @@ function generateDummyComposition() {
 // ============================================
 //  MAIN CHART & DATA LOGIC
 // ============================================
+function getStartDateStr() {
+    const end = new Date();
+    let start = new Date();
+    start.setFullYear(end.getFullYear() - 1);
+    return start.toISOString().split('T')[0];
+}
+
+// The server downsamples long ranges to one point per pixel of the main chart
+function getChartQuery() {
+    const canvas = document.getElementById('terminalChart');
+    const width = canvas ? Math.round(canvas.clientWidth) : 0;
+    return `start=${getStartDateStr()}` + (width >= 3 ? `&width=${width}` : '');
+}
+
+function fillNiftyGaps(data) {
+    let lastKnown = null;
+    for (let i = 0; i < data.nifty_index.length; i++) {
+        if (data.nifty_index[i] !== null) lastKnown = data.nifty_index[i];
+        else if (lastKnown !== null) data.nifty_index[i] = lastKnown;
+    }
+    lastKnown = null;
+    for (let i = data.nifty_index.length - 1; i >= 0; i--) {
+        if (data.nifty_index[i] !== null) lastKnown = data.nifty_index[i];
+        else if (lastKnown !== null) data.nifty_index[i] = lastKnown;
+    }
+}
+
+function renderMarketData() {
+    renderTimeframe(currentTimeframe);
+    draw52WeekChart(masterData);
+}
+
 async function fetchMarketData() {
     try {
         console.log("Preparing to fetch data from Python API...");
-        const end = new Date();
-        let start = new Date();
-        start.setFullYear(end.getFullYear() - 1);
-        const startDateStr = start.toISOString().split('T')[0];
-
-        const apiUrl = '/api/startups/chart?start=${startDateStr}';
+        const apiUrl = `/api/startups/chart?${getChartQuery()}`;
         console.log("Pinging: ", apiUrl);
 
         const response = await fetch(apiUrl);
@@ -171,19 +198,8 @@ async function fetchMarketData() {
         masterData = await response.json();
         console.log("Data successfully received!", masterData);
 
-        let lastKnown = null;
-        for (let i = 0; i < masterData.nifty_index.length; i++) {
-            if (masterData.nifty_index[i] !== null) lastKnown = masterData.nifty_index[i];
-            else if (lastKnown !== null) masterData.nifty_index[i] = lastKnown;
-        }
-        lastKnown = null;
-        for (let i = masterData.nifty_index.length - 1; i >= 0; i--) {
-            if (masterData.nifty_index[i] !== null) lastKnown = masterData.nifty_index[i];
-            else if (lastKnown !== null) masterData.nifty_index[i] = lastKnown;
-        }
-        
-        renderTimeframe(currentTimeframe);
-        draw52WeekChart(masterData);
+        fillNiftyGaps(masterData);
+        renderMarketData();
 
     } catch (error) {
         console.error("CRITICAL API ERROR:", error);
@@ -193,6 +209,7 @@ async function fetchMarketData() {
 }
 
 function renderTimeframe(tf) {
+    if (tf === '1D') { renderIntraday(); return; }
     if (!masterData || masterData.dates.length === 0) return;
 
     const end = new Date();
@@ -384,46 +401,145 @@ function draw52WeekChart(data) {
 }
 
 // --- NEW REAL DATA FETCHER ---
+function renderComposition(stocks) {
+    const grid = document.getElementById('comp-grid');
+    let htmlContent = '';
+
+    stocks.forEach(stock => {
+        // Safe Data Object for Modal
+        const dataObj = {
+            name: stock.name,
+            mktCap: `Rs. ${stock.mkt_cap.toLocaleString()} Cr`,
+            price: `Rs. ${stock.price}`,
+            high: `Rs. ${stock.high}`,
+            low: `Rs. ${stock.low}`,
+            sector: stock.sector,
+            weight: `${stock.weight}%`
+        };
+        const safeDataStr = JSON.stringify(dataObj).replace(/"/g, '&quot;');
+
+        htmlContent += `
+        <div class="comp-card" onclick="openModal('stock', ${safeDataStr})">
+            <div class="comp-ticker">${stock.ticker}</div>
+            <div class="comp-name">${stock.name}</div>
+            <div class="comp-stats">
+                <div><span class="c-stat-val">Rs. ${stock.price}</span><br><span class="c-stat-lbl">Price</span></div>
+                    <div><span class="c-stat-val" style="color:var(--accent-neon);">${stock.weight}%</span><br><span class="c-stat-lbl">Weight</span></div>
+            </div>
+        </div>
+        `;
+    });
+    grid.innerHTML = htmlContent;
+}
+
 async function fetchCompositionData() {
     try {
         const response = await fetch('/api/startups/composition');
         if (!response.ok) throw new Error("Network response was not ok");
         
-        const stocks = await response.json();
-        const grid = document.getElementById('comp-grid');
-        let htmlContent = '';
+        renderComposition(await response.json());
 
-        stocks.forEach(stock => {
-            // Safe Data Object for Modal
-            const dataObj = {
-                name: stock.name,
-                mktCap: `Rs. ${stock.mkt_cap.toLocaleString()} Cr`,
-                price: `Rs. ${stock.price}`,
-                high: `Rs. ${stock.high}`,
-                low: `Rs. ${stock.low}`,
-                sector: stock.sector,
-                weight: `${stock.weight}%`
-            };
-            const safeDataStr = JSON.stringify(dataObj).replace(/"/g, '&quot;');
+    } catch (error) {
+        console.error("Error fetching composition:", error);
+    }
+}
 
-            htmlContent += `
-            <div class="comp-card" onclick="openModal('stock', ${safeDataStr})">
-                <div class="comp-ticker">${stock.ticker}</div>
-                <div class="comp-name">${stock.name}</div>
-                <div class="comp-stats">
-                    <div><span class="c-stat-val">Rs. ${stock.price}</span><br><span class="c-stat-lbl">Price</span></div>
-                        <div><span class="c-stat-val" style="color:var(--accent-neon);">${stock.weight}%</span><br><span class="c-stat-lbl">Weight</span></div>
-                </div>
-            </div>
-            `;
-        });
-        grid.innerHTML = htmlContent;
+// ============================================
+//  LIVE STREAM (falls back to polling)
+// ============================================
+let compositionRows = {};
+
+function mergePoints(points) {
+    // Points start at the last date we already have, which may have been revised
+    points.dates.forEach((date, i) => {
+        const idx = masterData.dates.lastIndexOf(date);
+        if (idx === -1) {
+            masterData.dates.push(date);
+            masterData.startup_index.push(points.startup_index[i]);
+            masterData.nifty_index.push(points.nifty_index[i]);
+        } else {
+            masterData.startup_index[idx] = points.startup_index[i];
+            masterData.nifty_index[idx] = points.nifty_index[i];
+        }
+    });
+    fillNiftyGaps(masterData);
+}
+
+function startPolling() {
+    if (autoRefreshInterval) return;
+    fetchCompositionData();
+    fetchMarketData();
+    autoRefreshInterval = setInterval(() => fetchMarketData(), 60000);
+}
+
+function startLiveStream() {
+    if (!window.EventSource) { startPolling(); return; }
+
+    const source = new EventSource(`/api/startups/stream?${getChartQuery()}`);
 
+    source.addEventListener('snapshot', (e) => {
+        masterData = JSON.parse(e.data);
+        compositionRows = {};
+        fillNiftyGaps(masterData);
+        renderMarketData();
+    });
+
+    source.addEventListener('points', (e) => {
+        if (!masterData) return;
+        mergePoints(JSON.parse(e.data));
+        renderMarketData();
+    });
+
+    source.addEventListener('composition', (e) => {
+        JSON.parse(e.data).forEach(row => { compositionRows[row.ticker] = row; });
+        renderComposition(Object.values(compositionRows).sort((a, b) => b.weight - a.weight));
+    });
+
+    // EventSource reconnects by itself; only give up if the server refused the stream
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) startPolling();
+    };
+}
+
+// ============================================
+//  INTRADAY (1D)
+// ============================================
+let intradayData = null;
+let intradayInterval = null;
+
+async function fetchIntradayData() {
+    try {
+        const response = await fetch('/api/startups/intraday');
+        if (!response.ok) throw new Error("Network response was not ok");
+        intradayData = await response.json();
+        intradayData.dates = intradayData.labels;
+        fillNiftyGaps(intradayData);
+        if (currentTimeframe === '1D') renderIntraday();
     } catch (error) {
-        console.error("Error fetching composition:", error);
+        console.error("Intraday fetch failed:", error);
     }
 }
 
+function renderIntraday() {
+    if (!intradayData || intradayData.labels.length === 0) return;
+
+    // Values are relative to the previous close (= 100)
+    const latest = intradayData.startup_index[intradayData.startup_index.length - 1];
+    const change = latest - 100;
+
+    document.getElementById('val-current').innerText = latest.toFixed(2);
+    document.getElementById('val-change').innerText = (change >= 0 ? "+" : "") + change.toFixed(2);
+    document.getElementById('val-pct').innerText = (change >= 0 ? "+" : "") + change.toFixed(2) + "%";
+    document.getElementById('title-change').innerText = '1D Change';
+    document.getElementById('title-pct').innerText = '1D Return';
+
+    const colorCode = change >= 0 ? 'var(--accent-neon)' : 'var(--accent-red)';
+    document.getElementById('val-change').style.color = colorCode;
+    document.getElementById('val-pct').style.color = colorCode;
+
+    drawMainChart(intradayData.labels, intradayData.startup_index, intradayData.nifty_index, colorCode);
+}
+
 // --- INITIALIZATION ---
 console.log("System Initializing...");
 
@@ -432,6 +548,11 @@ document.querySelectorAll('.tf-btn').forEach(button => {
         document.querySelectorAll('.tf-btn').forEach(btn => btn.classList.remove('active'));
         e.target.classList.add('active');
         currentTimeframe = e.target.getAttribute('data-tf');
+        clearInterval(intradayInterval);
+        if (currentTimeframe === '1D') {
+            fetchIntradayData();
+            intradayInterval = setInterval(() => fetchIntradayData(), 60000);
+        }
         renderTimeframe(currentTimeframe);
     });
 });
@@ -439,7 +560,4 @@ document.querySelectorAll('.tf-btn').forEach(button => {
 generateDummyIPOs();
 // REMOVE: generateDummyComposition(); 
 // ADD:
-fetchCompositionData(); 
-
-fetchMarketData();
-autoRefreshInterval = setInterval(() => fetchMarketData(), 60000);
\ No newline at end of file
+startLiveStream();
\ No newline at end of file
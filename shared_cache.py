@@ -0,0 +1,49 @@
+import os
+import time
+import sqlite3
+import threading
+
+# Cross-process cache.
+# A small SQLite key/value table (WAL mode) next to the price store. Gunicorn workers use it
+# to share encoded response bodies, the refresh leader's status and the intraday session, so
+# adding workers does not multiply computation or upstream traffic.
+
+
+class SharedCache:
+    def __init__(self, path, max_entries=1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.writes = 0
+
+    def _db(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, updated REAL)")
+            self.local.db = db
+        return db
+
+    def get(self, key):
+        try:
+            row = self._db().execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return None if row is None else bytes(row[0])
+
+    def set(self, key, value):
+        try:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO cache (key, value, updated) VALUES (?, ?, ?)",
+                       (key, sqlite3.Binary(value), time.time()))
+            self.writes += 1
+            if self.writes % 64 == 0:
+                # Oldest entries go first, bodies of old generations are never read again
+                db.execute("DELETE FROM cache WHERE key NOT IN (SELECT key FROM cache ORDER BY updated DESC LIMIT ?)",
+                           (self.max_entries,))
+        except sqlite3.Error:
+            # The shared tier is an optimisation, each process still has its own caches
+            pass
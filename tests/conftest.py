@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# api reads its configuration at import: an empty store in a temp dir, filled offline from
+# the replay provider, and no background threads
+os.environ["PRICE_STORE_DIR"] = tempfile.mkdtemp(prefix="test_store_")
+os.environ["PRICE_PROVIDER"] = "replay"
+os.environ["BACKGROUND_REFRESH"] = "0"
+os.environ.pop("SHARED_CACHE_PATH", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api  # noqa: E402
+import backfill  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def snapshot():
+    """Store backfilled from HISTORY_START and the snapshot built from it."""
+    backfill.main(["--rate", "1000"])
+    api.refresh_snapshot(refresh=False)
+    return api.SNAPSHOT
+
+
+@pytest.fixture(scope="session")
+def prices(snapshot):
+    """Stored closes (dates x tickers) the snapshot was built from."""
+    frames = api.PRICE_STORE.frames()
+    return frames['Adj Close' if 'Adj Close' in frames else 'Close']
+
+
+@pytest.fixture
+def client(snapshot):
+    return api.app.test_client()
@@ -0,0 +1,49 @@
+import json
+
+import pandas as pd
+
+import backfill
+from price_store import PriceStore
+from providers import ReplayProvider
+
+
+class FailingProvider(ReplayProvider):
+    """Replay bars, except for chunks containing a ticker in `down`."""
+
+    def __init__(self, down=()):
+        super().__init__()
+        self.down = set(down)
+        self.requested = []
+
+    def download(self, tickers, start, end):
+        self.requested.append(backfill.job_key((tickers, start, end)))
+        if self.down & set(tickers):
+            raise ConnectionError("down")
+        return super().download(tickers, start, end)
+
+
+def test_plan_covers_the_range_with_exclusive_ends():
+    jobs = backfill.plan(["A", "B", "C"], "2024-01-01", "2024-01-10", chunk_tickers=2, chunk_days=4)
+    assert [(tickers, s.day, e.day) for tickers, s, e in jobs] == [
+        (["A", "B"], 1, 5), (["C"], 1, 5), (["A", "B"], 5, 9), (["C"], 5, 9), (["A", "B"], 9, 11), (["C"], 9, 11)]
+
+
+def test_resume_only_fetches_the_missing_chunks(tmp_path):
+    jobs = backfill.plan(["A.NS", "B.NS", "C.NS"], "2024-01-01", "2024-06-30", chunk_tickers=1, chunk_days=60)
+    store = PriceStore(str(tmp_path / "store"), "2024-01-01")
+    checkpoint = str(tmp_path / "backfill.json")
+
+    failed = backfill.run(jobs, store, FailingProvider(down={"B.NS"}), checkpoint, workers=2, flush_every=1)
+    missing = [backfill.job_key(job) for job in jobs if job[0] == ["B.NS"]]
+    assert sorted(failed) == sorted(missing)
+    with open(checkpoint) as f:
+        assert len(json.load(f)['done']) == len(jobs) - len(missing)
+
+    # The second run downloads the failed chunks and nothing else
+    provider = FailingProvider()
+    assert backfill.run(jobs, store, provider, checkpoint, workers=2, flush_every=1) == []
+    assert sorted(provider.requested) == sorted(missing)
+
+    expected = ReplayProvider().download(["A.NS", "B.NS", "C.NS"], "2024-01-01", "2024-07-01")['Close']
+    close = store.frames()['Close']
+    pd.testing.assert_frame_equal(close[sorted(close.columns)], expected, check_freq=False, check_index_type=False)
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import api
+from backtest import capped_weights, rebalance_rows, run_backtests
+
+
+def test_capped_weights():
+    weights = capped_weights([[60.0, 30.0, 10.0], [1.0, 1.0, 0.0]], [0.4, 0.1])
+    np.testing.assert_allclose(weights.sum(axis=1), 1)
+    # The excess goes to the uncapped names pro rata until none is above the cap (0.45 is);
+    # a cap below 1/n becomes equal weight
+    np.testing.assert_allclose(weights[0], [0.4, 0.4, 0.2])
+    np.testing.assert_allclose(weights[1], [0.5, 0.5, 0])
+
+
+def test_rebalance_rows_are_first_trading_days():
+    dates = pd.bdate_range("2024-01-01", "2024-07-31")
+    rows = rebalance_rows(dates, "quarterly")
+    assert list(dates[rows].strftime('%Y-%m-%d')) == ["2024-01-01", "2024-04-01", "2024-07-01"]
+    assert list(rebalance_rows(dates, "none")) == [0]
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(3)
+    dates = pd.bdate_range("2024-01-01", periods=120)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(len(dates), 4)), axis=0))
+    shares = np.array([5.0, 2.0, 1.0, 8.0])
+    return dates, prices, prices * shares
+
+
+def test_buy_and_hold_market_is_the_cap_weighted_index(panel):
+    dates, prices, caps = panel
+    levels, turnover = run_backtests(dates, prices, caps, [{"weighting": "market", "cap": None, "rebalance": "none"}])
+    total = caps.sum(axis=1)
+    np.testing.assert_allclose(levels[:, 0], total / total[0] * 100)
+    assert turnover[0] == 0
+
+
+def test_monthly_equal_weight_matches_a_direct_loop(panel):
+    dates, prices, caps = panel
+    levels, _ = run_backtests(dates, prices, caps, [{"weighting": "equal", "cap": None, "rebalance": "monthly"}])
+    expected, holdings, rows = [], None, set(rebalance_rows(dates, "monthly"))
+    for t in range(len(dates)):
+        if t in rows:
+            # Sell at today's prices, buy a quarter of the value in every name
+            value = 100.0 if holdings is None else holdings @ prices[t]
+            holdings = value / 4 / prices[t]
+        expected.append(holdings @ prices[t])
+    np.testing.assert_allclose(levels[:, 0], expected)
+
+
+def test_backtest_route(client, prices):
+    start = prices.index[-250].strftime('%Y-%m-%d')
+    data = client.get("/api/startups/backtest?start=%s&weighting=market,equal&cap=none,0.2&rebalance=monthly,none" % start).get_json()
+    assert len(data['results']) == 8 and data['dates'][0] == start
+    for result in data['results']:
+        assert result['index'][0] == 100 and len(result['index']) == len(data['dates'])
+
+
+def test_float_weighting_needs_float_factors(client, prices, monkeypatch):
+    start = prices.index[-200].strftime('%Y-%m-%d')
+    url = "/api/startups/backtest?start=%s&weighting=float,market" % start
+    response = client.get(url)
+    assert response.status_code == 400 and "FLOAT_DB" in response.get_json()['error']
+
+    # With factors float weighting differs from market weighting
+    monkeypatch.setattr(api, "FLOAT_DB", {t: 0.2 for t in list(api.INDEX_ENGINE.members("startups"))[:5]})
+    results = client.get(url).get_json()['results']
+    assert results[0]['index'] != results[1]['index']
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+import api
+from price_matrix import PriceMatrix
+
+
+def frames(close, adjust=1.0):
+    index = pd.bdate_range(end="2024-06-28", periods=len(close))
+    close = pd.DataFrame({"A.NS": close, "B.NS": np.linspace(100, 120, len(close))}, index=index)
+    return {
+        "Close": close,
+        "Adj Close": close * adjust,
+        "High": close * 1.01,
+        "Low": close * 0.99,
+    }
+
+
+def test_weights_and_range(snapshot):
+    rows = snapshot['composition']
+    assert abs(sum(row['weight'] for row in rows) - 100) < 0.1
+    assert all(row['low'] <= row['price'] <= row['high'] for row in rows)
+    assert [row['weight'] for row in rows] == sorted((row['weight'] for row in rows), reverse=True)
+
+
+def test_range_uses_unadjusted_prices():
+    # Adj Close at half the traded price, as after large dividends
+    matrix = PriceMatrix(frames(np.linspace(200, 300, 300), adjust=0.5))
+    meta = pd.DataFrame({"shares": [1e6, 1e6]}, index=["A.NS", "B.NS"])
+    row = next(r for r in api.calculate_composition(["A.NS", "B.NS"], meta, matrix) if r['ticker'] == "A")
+    year = matrix.values['Low'][matrix.row(matrix.dates[-1] - pd.Timedelta(days=365)):, matrix.columns["A.NS"]]
+    assert row['low'] == round(float(year.min()), 2)
+    assert row['high'] == round(300 * 1.01, 2)
+    assert row['price'] == 150.0
+
+
+def test_stale_tickers_are_left_out():
+    data = frames(np.linspace(200, 300, 50))
+    data = {field: frame.assign(**{"A.NS": np.r_[frame["A.NS"].to_numpy()[:40], [np.nan] * 10]}) for field, frame in data.items()}
+    meta = pd.DataFrame({"shares": [1e6, 1e6]}, index=["A.NS", "B.NS"])
+    rows = api.calculate_composition(["A.NS", "B.NS"], meta, PriceMatrix(data))
+    assert [r['ticker'] for r in rows] == ["B"]
+    assert rows[0]['weight'] == 100.0
@@ -0,0 +1,77 @@
+import json
+
+import numpy as np
+import pytest
+
+from downsample import downsample_indices, lttb
+
+
+def test_lttb_keeps_ends_and_extremes():
+    y = np.sin(np.linspace(0, 6 * np.pi, 1000))
+    y[437] = 5.0
+    keep = lttb(y, 50)
+    assert len(keep) == 50 and keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+    assert 437 in keep
+
+
+def test_lttb_short_series_unchanged():
+    np.testing.assert_array_equal(lttb(np.arange(10.0), 20), np.arange(10))
+    np.testing.assert_array_equal(lttb(np.arange(10.0), 2), [0, 9])
+
+
+@pytest.mark.parametrize("n", [3, 4, 10, 57, 300])
+@pytest.mark.parametrize("series", [1, 2, 20])
+def test_downsample_indices_within_budget(n, series):
+    rng = np.random.default_rng(n * series)
+    columns = list(np.cumsum(rng.normal(size=(1000, series)), axis=0).T)
+    columns[0][:100] = np.nan
+    keep = downsample_indices(columns, n)
+    assert 0 < len(keep) <= n
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_downsample_indices_without_usable_series():
+    keep = downsample_indices([np.full(100, np.nan)], 10)
+    assert len(keep) == 10 and keep[0] == 0 and keep[-1] == 99
+
+
+def start(prices, days):
+    return prices.index[-days].strftime('%Y-%m-%d')
+
+
+@pytest.mark.parametrize("query", ["points=3", "points=4", "points=50", "width=120"])
+@pytest.mark.parametrize("route", ["/api/startups/chart", "/api/startups/sectors", "/api/indices/startups/chart",
+                                   "/api/startups/backtest"])
+def test_points_limit(client, prices, route, query):
+    limit = int(query.split("=")[1])
+    response = client.get("%s?start=%s&%s" % (route, start(prices, 700), query))
+    assert response.status_code == 200
+    data = response.get_json()
+    assert 0 < len(data['dates']) <= limit
+    assert data['dates'][0] == start(prices, 700)
+
+
+def test_points_limit_errors(client):
+    assert client.get("/api/startups/chart?points=2").status_code == 400
+    assert client.get("/api/startups/chart?points=many").status_code == 400
+    assert client.get("/api/startups/stream?width=1").status_code == 400
+
+
+def test_points_limit_on_stream(client, prices):
+    response = client.get("/api/startups/stream?start=%s&points=5" % start(prices, 700))
+    try:
+        events = iter(response.response)
+        assert next(events) == b"retry: 5000\n\n"
+        event = next(events).decode()
+        assert event.startswith("event: snapshot")
+        assert 0 < len(json.loads(event.split("data: ", 1)[1])['dates']) <= 5
+    finally:
+        response.close()
+
+
+def test_full_chart_without_limit(client, prices):
+    data = client.get("/api/startups/chart?start=%s" % start(prices, 700)).get_json()
+    assert len(data['dates']) == 700
+
@@ -0,0 +1,72 @@
+import gzip
+import json
+
+import numpy as np
+
+import api
+
+
+def chart_url(prices, days=250, extra=""):
+    return "/api/startups/chart?start=%s%s" % (prices.index[-days].strftime('%Y-%m-%d'), extra)
+
+
+def test_etag_and_304(client, prices):
+    first = client.get(chart_url(prices))
+    assert first.status_code == 200 and first.headers['ETag'].startswith('W/')
+    again = client.get(chart_url(prices), headers={"If-None-Match": first.headers['ETag']})
+    assert again.status_code == 304 and again.data == b""
+    assert again.headers['ETag'] == first.headers['ETag']
+    # Another range is another representation
+    other = client.get(chart_url(prices, 100), headers={"If-None-Match": first.headers['ETag']})
+    assert other.status_code == 200 and other.headers['ETag'] != first.headers['ETag']
+
+
+def test_if_modified_since(client, prices):
+    first = client.get(chart_url(prices))
+    again = client.get(chart_url(prices), headers={"If-Modified-Since": first.headers['Last-Modified']})
+    assert again.status_code == 304
+
+
+def test_gzip(client, prices):
+    plain = client.get(chart_url(prices))
+    zipped = client.get(chart_url(prices), headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers['Content-Encoding'] == "gzip"
+    assert "Accept-Encoding" in zipped.headers['Vary']
+    assert gzip.decompress(zipped.data) == plain.data
+    assert len(zipped.data) < len(plain.data)
+
+
+def test_small_bodies_stay_uncompressed(client, prices):
+    response = client.get(chart_url(prices, 2), headers={"Accept-Encoding": "gzip"})
+    assert len(response.data) < api.MIN_COMPRESS_SIZE
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_compact_layout(client, prices):
+    points = client.get(chart_url(prices)).get_json()
+    data = client.get(chart_url(prices, extra="&format=compact")).data
+    assert data[:4] == b'IDX1'
+    stale = data[4]
+    n = int(np.frombuffer(data, '<u4', 1, 5)[0])
+    first = int(np.frombuffer(data, '<i4', 1, 9)[0])
+    deltas = np.frombuffer(data, '<u2', n - 1, 13)
+    offset = 13 + 2 * (n - 1)
+    startup = np.frombuffer(data, '<f4', n, offset)
+    nifty = np.frombuffer(data, '<f4', n, offset + 4 * n)
+    assert len(data) == offset + 8 * n
+
+    days = first + np.r_[0, np.cumsum(deltas)]
+    assert list(np.array(days, dtype='datetime64[D]').astype(str)) == points['dates']
+    assert stale == int(points['stale'])
+    np.testing.assert_allclose(startup, points['startup_index'], rtol=1e-6)
+    expected = np.array([np.nan if v is None else v for v in points['nifty_index']])
+    np.testing.assert_allclose(nifty, expected, rtol=1e-6)
+
+
+def test_body_cache_reused(client, prices, monkeypatch):
+    client.get(chart_url(prices, 180))
+    calls = []
+    original = api.index_points
+    monkeypatch.setattr(api, "index_points", lambda *args, **kwargs: calls.append(1) or original(*args, **kwargs))
+    body = client.get(chart_url(prices, 180)).data
+    assert calls == [] and json.loads(body)['dates']
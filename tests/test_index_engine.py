@@ -0,0 +1,168 @@
+import gc
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import api
+from index_engine import IndexEngine, missing_shares
+from row_buffer import RowBuffer
+
+
+def direct_levels(prices, shares):
+    """Divisor-chained index computed day by day from the definition."""
+    prices = prices.reindex(columns=list(shares)).ffill()
+    previous = prices.shift(1)
+    previous.iloc[0] = prices.iloc[0]
+    eligible = previous.notna()
+    shares = pd.Series(shares)
+    caps = (prices.where(eligible, 0.0) * shares).sum(axis=1).to_numpy()
+    carried = (previous.where(eligible, 0.0) * shares).sum(axis=1).to_numpy()
+    levels = [caps[0]]
+    for t in range(1, len(caps)):
+        levels.append(levels[-1] * caps[t] / carried[t] if carried[t] > 0 else levels[-1])
+    return np.array(levels)
+
+
+def test_index_matches_direct_computation(snapshot, prices):
+    state = snapshot['index_state'][0]
+    expected = direct_levels(prices, api.INDEX_ENGINE.members("startups"))
+    np.testing.assert_allclose(state.levels[:, state.ids.index("startups")], expected, rtol=1e-9)
+
+
+def test_chart_is_rebased_index(client, prices):
+    start = prices.index[-60].strftime('%Y-%m-%d')
+    data = client.get("/api/startups/chart?start=%s" % start).get_json()
+    expected = direct_levels(prices, api.INDEX_ENGINE.members("startups"))[-60:]
+    assert data['dates'][0] == start and len(data['dates']) == 60
+    np.testing.assert_allclose(data['startup_index'], expected / expected[0] * 100, rtol=1e-9)
+
+
+def test_update_matches_build(prices):
+    engine = IndexEngine({"startups": {"constituents": list(prices.columns[:20]), "shares": {}}})
+    full = engine.build(prices)
+
+    # Yesterday's bar revised and new days appended, as a refresh does
+    stale = prices.iloc[:-5].copy()
+    stale.iloc[-1] *= 1.05
+    state = engine.update(engine.build(stale), prices.iloc[-6:])
+    assert state.revised_from == len(prices) - 6
+    assert state.dates.equals(full.dates)
+    for field in ("prices", "caps", "carried", "levels"):
+        np.testing.assert_allclose(getattr(state, field), getattr(full, field), rtol=1e-12)
+
+
+def test_update_leaves_the_older_state_unchanged(prices):
+    engine = IndexEngine({"startups": {"constituents": list(prices.columns[:10]), "shares": {}}})
+    stale = prices.iloc[:-3].copy()
+    stale.iloc[-1] *= 1.05
+    older = engine.build(stale)
+    levels = older.levels.copy()
+    state = engine.update(older, prices.iloc[-4:])
+    # The revised last day went into the other slot of the same buffers
+    assert state.buffers['levels'][0] is older.buffers['levels'][0]
+    np.testing.assert_array_equal(older.levels, levels)
+    assert state.levels[len(older.levels) - 1, 0] != older.levels[-1, 0]
+
+
+def test_daily_updates_match_build(prices):
+    engine = IndexEngine({"startups": {"constituents": list(prices.columns[:10]), "shares": {}}})
+    state = engine.build(prices.iloc[:-300])
+    first = state
+    expected = first.levels.copy()
+    for day in range(len(prices) - 300, len(prices)):
+        state = engine.update(state, prices.iloc[day - 1:day + 1])
+    np.testing.assert_allclose(state.levels, engine.build(prices).levels, rtol=1e-12)
+    np.testing.assert_array_equal(first.levels, expected)
+
+
+def test_replaced_snapshot_keeps_its_rows(snapshot):
+    # The next generation revises the last day, as a refresh does
+    matrix, state = snapshot['matrix'], snapshot['index_state'][0]
+    prices, levels = matrix.prices.copy(), state.levels.copy()
+    frames = {field: frame.copy() for field, frame in api.PRICE_STORE.frames().items()}
+    for frame in frames.values():
+        frame.iloc[-1] *= 1.01
+    revised = frames[matrix.field]
+    new_matrix = matrix.extended(frames, matrix.generation + 1, revised.index[-1])
+    new_state = api.INDEX_ENGINE.update(state, revised.iloc[-1:])
+    assert new_matrix is not None and new_state.revised_from == state.n - 1
+    assert not np.allclose(new_state.levels[-1], levels[-1])
+    np.testing.assert_array_equal(matrix.prices, prices)
+    np.testing.assert_array_equal(state.levels, levels)
+
+
+class Reader:
+    pass
+
+
+def test_row_buffer_writes_in_place_only_past_live_readers():
+    first = Reader()
+    buffer = RowBuffer(np.arange(3.0), spare=2)
+    view = buffer.attach(first, 0, 3)
+
+    # Appending after the reader's rows: in place
+    second = Reader()
+    same, slot = buffer.write(second, 0, 3, 3, [30.0])
+    assert same is buffer and slot == 0
+    np.testing.assert_array_equal(view, [0, 1, 2])
+
+    # Revising a row `second` reads: the other slot, brought up to date first
+    third = Reader()
+    same, slot = buffer.write(third, 0, 4, 3, [31.0, 40.0])
+    assert same is buffer and slot == 1
+    np.testing.assert_array_equal(buffer.attach(third, 1, 5), [0, 1, 2, 31, 40])
+    np.testing.assert_array_equal(buffer.attach(second, 0, 4), [0, 1, 2, 30])
+
+    # Both slots read past the revised row: a new buffer
+    fourth = Reader()
+    grown, slot = buffer.write(fourth, 1, 5, 3, [32.0, 41.0])
+    assert grown is not buffer
+    np.testing.assert_array_equal(grown.attach(fourth, slot, 5), [0, 1, 2, 32, 41])
+
+    # Once `second` is gone its slot can take the revision
+    del second
+    gc.collect()
+    fifth = Reader()
+    same, slot = buffer.write(fifth, 1, 5, 3, [33.0, 42.0])
+    assert same is buffer and slot == 0
+    np.testing.assert_array_equal(buffer.attach(fifth, 0, 5), [0, 1, 2, 33, 42])
+    np.testing.assert_array_equal(buffer.attach(third, 1, 5), [0, 1, 2, 31, 40])
+    np.testing.assert_array_equal(view, [0, 1, 2])
+
+    # Past the spare rows the buffer grows
+    grown, _ = buffer.write(Reader(), 0, 5, 5, np.arange(10.0))
+    assert grown is not buffer and len(grown.slots[0]) >= 15
+
+
+def test_state_pickle_round_trip(snapshot):
+    state = snapshot['index_state'][0]
+    loaded = pickle.loads(pickle.dumps(state))
+    assert loaded.token == state.token and loaded.dates.equals(state.dates)
+    np.testing.assert_array_equal(loaded.levels, state.levels)
+
+
+def test_row_buffer_catching_up_keeps_older_readers():
+    buffer = RowBuffer(np.arange(4.0), spare=4)
+    old = Reader()
+    view = buffer.attach(old, 0, 2)
+    current = Reader()
+    buffer, slot = buffer.write(current, 0, 2, 2, [20.0, 30.0])
+    latest = Reader()
+    buffer, slot = buffer.write(latest, slot, 4, 1, [10.0, 20.0, 31.0])
+    assert slot == 1
+    # Slot 0 now differs from row 1 on, where `old` still reads
+    newer = Reader()
+    del current
+    grown, slot = buffer.write(newer, 1, 4, 3, [32.0])
+    np.testing.assert_array_equal(view, [0, 1])
+    np.testing.assert_array_equal(grown.attach(newer, slot, 4), [0, 10, 20, 32])
+
+
+def test_event_additions_need_share_counts():
+    definition = dict(api.INDEX_DEFINITIONS["startups"])
+    assert missing_shares(definition) == []
+    definition["events"] = [{"date": "2025-06-02", "add": ["SWIGGY.NS"], "remove": ["YATRA.NS"]}]
+    assert missing_shares(definition) == ["SWIGGY.NS"]
+    definition["events"][0]["shares"] = {"SWIGGY.NS": 2200000000}
+    assert missing_shares(definition) == []
@@ -0,0 +1,56 @@
+import json
+import logging
+
+import numpy as np
+
+import api
+import fill_shares
+from index_engine import IndexEngine, load_index_definitions
+
+
+def write(tmp_path, definitions):
+    path = tmp_path / "indices.json"
+    path.write_text(json.dumps(definitions))
+    return str(path)
+
+
+def test_definitions_without_shares_are_skipped(tmp_path, caplog):
+    path = write(tmp_path, {
+        "full": {"constituents": ["A.NS", "B.NS"], "shares": {"A.NS": 10, "B.NS": 20}},
+        "gaps": {"constituents": ["A.NS", "C.NS"], "shares": {"A.NS": 10}},
+    })
+    with caplog.at_level(logging.WARNING):
+        definitions = load_index_definitions(path)
+    assert list(definitions) == ["full"]
+    assert "C.NS" in caplog.text
+    assert load_index_definitions(str(tmp_path / "missing.json")) == {}
+
+
+def test_fill_shares_writes_missing_counts(tmp_path, monkeypatch):
+    path = write(tmp_path, {"gaps": {"constituents": ["A.NS", "C.NS"], "shares": {"A.NS": 10}}})
+    monkeypatch.setattr(fill_shares, "shares_outstanding", lambda ticker: 42)
+    assert fill_shares.main(["--file", path]) == 0
+    assert json.load(open(path))["gaps"]["shares"] == {"A.NS": 10, "C.NS": 42}
+    assert list(load_index_definitions(path)) == ["gaps"]
+    assert fill_shares.main(["--file", str(tmp_path / "missing.json")]) == 1
+
+
+def test_indices_share_one_pass(prices):
+    tickers = list(prices.columns[:6])
+    engine = IndexEngine({
+        "first": {"constituents": tickers[:3], "shares": {t: 1e6 for t in tickers[:3]}},
+        "second": {"constituents": tickers[2:], "shares": {t: 2e6 for t in tickers[2:]}},
+    })
+    state = engine.build(prices)
+    for index_id in engine.ids:
+        alone = IndexEngine({index_id: engine.definitions[index_id]}).build(prices)
+        np.testing.assert_allclose(state.levels[:, engine.ids.index(index_id)], alone.levels[:, 0], rtol=1e-12)
+
+
+def test_indices_routes(client, prices):
+    listed = client.get("/api/indices").get_json()
+    assert [row['id'] for row in listed] == api.INDEX_ENGINE.ids
+    start = prices.index[-30].strftime('%Y-%m-%d')
+    chart = client.get("/api/indices/startups/chart?start=%s" % start).get_json()
+    assert chart['dates'][0] == start and chart['index'][0] == 100
+    assert client.get("/api/indices/nope/chart").status_code == 404
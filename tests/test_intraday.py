@@ -0,0 +1,79 @@
+import functools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import api
+from intraday import RingBuffer
+
+
+def test_ring_buffer_keeps_latest_rows_in_order():
+    ring = RingBuffer(capacity=4, width=1)
+    for t in range(1, 7):
+        assert ring.append(t, [t * 10])
+    _, times, values = ring.read()
+    np.testing.assert_array_equal(times, [3, 4, 5, 6])
+    np.testing.assert_array_equal(values[:, 0], [30, 40, 50, 60])
+    assert ring.last_time == 6
+
+
+def test_ring_buffer_replaces_last_minute_and_rejects_older():
+    ring = RingBuffer(capacity=4, width=1)
+    ring.append(1, [1])
+    ring.append(2, [2])
+    version = ring.version
+    assert ring.append(2, [3])
+    assert not ring.append(1, [9])
+    new_version, times, values = ring.read(since=1)
+    assert new_version == version + 1
+    np.testing.assert_array_equal(times, [2])
+    np.testing.assert_array_equal(values[:, 0], [3])
+
+
+@pytest.fixture
+def session(snapshot, prices, monkeypatch):
+    """Last stored day as the intraday session, polled at `at` (IST wall time)."""
+    day = prices.index[-1].strftime('%Y-%m-%d')
+    provider = api.PROVIDER.provider
+
+    def poll_at(at):
+        now = pd.Timestamp("%s %s" % (day, at), tz="Asia/Kolkata")
+        monkeypatch.setattr(provider, "intraday", functools.partial(type(provider).intraday, provider, now=now))
+
+    monkeypatch.setattr(api, "INTRADAY_BUFFER", RingBuffer(api.INTRADAY_CAPACITY, width=2))
+    poll_at("10:00")
+    return day, poll_at
+
+
+def test_intraday_session_relative_to_previous_close(client, snapshot, session):
+    day, _ = session
+    data = client.get("/api/startups/intraday").get_json()
+    assert data['session'] == day and not data['stale']
+    assert len(data['times']) == 46  # 09:15 to 10:00
+    assert data['labels'][0] == "09:15" and data['labels'][-1] == "10:00"
+
+    # Basket at the minute closes over the basket at the previous close
+    members = api.INDEX_ENGINE.members("startups", day)
+    closes = api.PROVIDER.intraday(list(members)).reindex(columns=list(members))
+    state = snapshot['index_state'][0]
+    previous = state.prices[state.n - 2, [api.INDEX_ENGINE.universe.index(t) for t in members]]
+    shares = np.where(np.isnan(previous), 0.0, list(members.values()))
+    expected = closes.to_numpy() @ shares / np.nansum(previous * shares) * 100
+    np.testing.assert_allclose(data['startup_index'], expected, rtol=1e-4)
+
+
+def test_intraday_since_and_revalidation(client, session):
+    _, poll_at = session
+    first = client.get("/api/startups/intraday")
+    etag = first.headers['ETag']
+    assert client.get("/api/startups/intraday", headers={"If-None-Match": etag}).status_code == 304
+
+    # The next poll revises 10:00 and adds five minutes; the buffer version moves the ETag
+    poll_at("10:05")
+    api.poll_intraday()
+    last = first.get_json()['times'][-1]
+    newer = client.get("/api/startups/intraday?since=%d" % last).get_json()
+    assert newer['labels'] == ["10:01", "10:02", "10:03", "10:04", "10:05"]
+    again = client.get("/api/startups/intraday", headers={"If-None-Match": etag})
+    assert again.status_code == 200 and len(again.get_json()['times']) == 51
@@ -0,0 +1,70 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import api
+from price_matrix import PriceMatrix, forward_fill
+
+
+def frames_with_gaps():
+    dates = pd.bdate_range("2024-01-01", periods=6)
+    close = pd.DataFrame({"A": [1.0, np.nan, 3.0, np.nan, np.nan, 6.0],
+                          "B": [np.nan, np.nan, 2.0, 2.5, np.nan, np.nan],
+                          "C": np.nan}, index=dates)
+    return {"Close": close, "Volume": close * 10}
+
+
+def test_forward_fill_keeps_leading_gaps():
+    values = np.array([[np.nan, 1.0], [2.0, np.nan], [np.nan, np.nan]])
+    np.testing.assert_array_equal(forward_fill(values), [[np.nan, 1], [2, 1], [2, 1]])
+
+
+def test_closes_are_filled_and_last_bars_tracked():
+    matrix = PriceMatrix(frames_with_gaps(), 1)
+    np.testing.assert_array_equal(matrix.prices[:, 0], [1, 1, 3, 3, 3, 6])
+    np.testing.assert_array_equal(matrix.prices[:, 1], [np.nan, np.nan, 2, 2.5, 2.5, 2.5])
+    # Other fields keep their gaps
+    assert np.isnan(matrix.values['Volume'][1, 0])
+    np.testing.assert_array_equal(matrix.last_valid, [5, 3, -1])
+    assert list(matrix.labels[:2]) == ["2024-01-01", "2024-01-02"]
+
+
+def test_window_row_and_positions():
+    matrix = PriceMatrix(frames_with_gaps(), 1)
+    assert matrix.row("2024-01-06") == 5  # a Saturday: the next trading day
+    assert matrix.window("2024-01-02", "2024-01-04") == (1, 4)
+    assert matrix.window(None, "2023-12-01") == (0, 0)
+    assert matrix.window("2024-01-03") == (2, 6)
+    present, positions = matrix.positions(["C", "Z", "A"])
+    assert present == ["C", "A"] and list(positions) == [2, 0]
+
+
+def test_extended_matrix_matches_rebuild(snapshot):
+    frames = api.PRICE_STORE.frames()
+    older = {field: frame.iloc[:-3] for field, frame in frames.items()}
+    changed_from = frames['Close'].index[-4]
+    matrix = PriceMatrix(older, 1).extended(frames, 2, changed_from)
+    full = PriceMatrix(frames, 2)
+    assert matrix is not None and matrix.dates.equals(full.dates)
+    assert list(matrix.labels) == list(full.labels)
+    np.testing.assert_array_equal(matrix.last_valid, full.last_valid)
+    for field in full.values:
+        np.testing.assert_array_equal(matrix.values[field], full.values[field])
+
+
+def test_extended_needs_a_rebuild_when_columns_change():
+    frames = frames_with_gaps()
+    matrix = PriceMatrix({field: frame.iloc[:-1] for field, frame in frames.items()}, 1)
+    wider = {field: frame.assign(D=1.0) for field, frame in frames.items()}
+    assert matrix.extended(wider, 2, frames['Close'].index[-2]) is None
+
+
+def test_pickle_round_trip(snapshot):
+    matrix = snapshot['matrix']
+    loaded = pickle.loads(pickle.dumps(matrix))
+    assert loaded.dates.equals(matrix.dates) and loaded.tickers == matrix.tickers
+    np.testing.assert_array_equal(loaded.prices, matrix.prices)
+    # The loaded copy can be extended like the original
+    frames = api.PRICE_STORE.frames()
+    assert loaded.extended(frames, matrix.generation + 1, frames['Close'].index[-1]) is not None
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+from providers import FIELDS, ReplayProvider
+
+
+def bars(dates, tickers, value):
+    index = pd.DatetimeIndex(dates)
+    return {field: pd.DataFrame(np.full((len(index), len(tickers)), float(value)), index=index, columns=tickers)
+            for field in FIELDS}
+
+
+def test_merge_keeps_history_and_replaces_revised_bars(tmp_path):
+    store = PriceStore(str(tmp_path), "2024-01-01")
+    store.write([(["A", "B"], bars(["2024-01-01", "2024-01-02", "2024-01-03"], ["A", "B"], 10))])
+    first = store.generation
+
+    # The last bar comes back revised, with a new day after it
+    store.write([(["A", "B"], bars(["2024-01-03", "2024-01-04"], ["A", "B"], 11))])
+    frames, generation, changed_from, _ = store.view()
+    assert generation == first + 1
+    assert changed_from == pd.Timestamp("2024-01-03")
+    np.testing.assert_array_equal(frames['Close']['A'].to_numpy(), [10, 10, 11, 11])
+
+    # Persisted: a second store on the same directory reads the same frames
+    reloaded = PriceStore(str(tmp_path), "2024-01-01").frames()
+    pd.testing.assert_frame_equal(reloaded['Close'], frames['Close'], check_freq=False, check_index_type=False)
+
+
+def test_unchanged_bars_keep_the_generation(tmp_path):
+    store = PriceStore(str(tmp_path), "2024-01-01")
+    store.write([(["A"], bars(["2024-01-01", "2024-01-02"], ["A"], 10))])
+    generation = store.generation
+    store.write([(["A"], bars(["2024-01-02"], ["A"], 10))])
+    assert store.generation == generation
+
+
+def test_new_ticker_changes_from_the_first_day(tmp_path):
+    store = PriceStore(str(tmp_path), "2024-01-01")
+    store.write([(["A"], bars(["2024-01-01", "2024-01-02"], ["A"], 10))])
+    store.write([(["B"], bars(["2024-01-02"], ["B"], 5))])
+    frames, _, changed_from, _ = store.view()
+    assert changed_from == pd.Timestamp("2024-01-01")
+    assert sorted(frames["Close"].columns) == ["A", "B"]
+    assert np.isnan(frames['Close'].loc["2024-01-01", "B"])
+
+
+def test_ensure_fetches_only_missing_bars(tmp_path):
+    provider = ReplayProvider()
+    store = PriceStore(str(tmp_path), "2024-01-01", provider=provider)
+    store.ensure(["A.NS"], "2024-01-01", "2024-03-01")
+    calls = provider.calls
+    # Already stored: no download (refresh=False skips re-fetching the last bar)
+    store.ensure(["A.NS"], "2024-01-01", "2024-03-01", refresh=False)
+    assert provider.calls == calls
+    # A new ticker is fetched on its own, over the stored range
+    store.ensure(["A.NS", "B.NS"], "2024-01-01", "2024-03-01", refresh=False)
+    assert provider.calls == calls + 1
+    frames = store.frames()
+    assert frames['Close']['B.NS'].notna().all()
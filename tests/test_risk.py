@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from analytics import calculate_risk_metrics, risk_matrix
+
+
+def percent(value):
+    return float(value.rstrip('%'))
+
+
+def panel(prices, days=400):
+    # The stored column order is not fixed
+    return prices.iloc[-days:][sorted(prices.columns)]
+
+
+def test_matches_single_series_metrics(prices):
+    data = panel(prices)
+    risk = risk_matrix(data.to_numpy(), windows=())
+    for i, ticker in enumerate(data.columns):
+        expected = calculate_risk_metrics(data[ticker], ticker)
+        assert round(risk['volatility'][i], 2) == percent(expected['Volatility (Ann.)'])
+        assert round(risk['max_drawdown'][i], 2) == percent(expected['Max Drawdown'])
+
+
+def test_rolling_volatility_and_beta(prices):
+    data = panel(prices)
+    values = data.to_numpy()
+    benchmark = values[:, 0]
+    risk = risk_matrix(values, benchmark=benchmark, windows=(30,))
+    returns = data.pct_change()
+    expected = returns.rolling(30).std().to_numpy() * np.sqrt(252) * 100
+    np.testing.assert_allclose(risk['rolling_volatility'][30], expected, rtol=1e-6, equal_nan=True)
+
+    r = returns.to_numpy()[1:]
+    for i in range(values.shape[1]):
+        cov = np.cov(r[:, i], r[:, 0])
+        assert abs(risk['beta'][i] - cov[0, 1] / cov[1, 1]) < 1e-9
+    assert abs(risk['beta'][0] - 1) < 1e-12
+
+
+def test_late_listing_and_short_windows():
+    values = np.array([[np.nan, 10.0], [np.nan, 11.0], [5.0, 12.0], [6.0, 12.0], [3.0, np.nan]])
+    risk = risk_matrix(values, windows=())
+    expected = calculate_risk_metrics(pd.Series(values[2:, 0]), "late")
+    assert round(risk['max_drawdown'][0], 2) == percent(expected['Max Drawdown'])
+    # One return is not enough for a sample std
+    assert np.isnan(risk_matrix(values[:2, 1:], windows=())['volatility'][0])
+
+
+def test_risk_route(client, snapshot, prices):
+    start = prices.index[-200].strftime('%Y-%m-%d')
+    data = client.get("/api/startups/risk?start=%s" % start).get_json()
+    assert len(data['dates']) == 200 and data['dates'][0] == start
+    state = snapshot['index_state'][0]
+    levels = pd.Series(state.levels[-200:, state.ids.index("startups")])
+    expected = calculate_risk_metrics(levels, "Startup Index")
+    index = data['series']['Startup Index']
+    assert index['volatility'] == percent(expected['Volatility (Ann.)'])
+    assert index['max_drawdown'] == percent(expected['Max Drawdown'])
+    assert len(index['rolling_volatility']['30']) == 200
+    # Constituent curves only on request
+    assert 'drawdown' not in data['series']['PAYTM']
+    full = client.get("/api/startups/risk?start=%s&curves=all" % start).get_json()
+    assert len(full['series']['PAYTM']['drawdown']) == 200
+
+
+def test_risk_route_single_day(client, prices):
+    day = prices.index[-1].strftime('%Y-%m-%d')
+    data = client.get("/api/startups/risk?start=%s&end=%s" % (day, day)).get_json()
+    assert data['series']['Startup Index']['volatility'] is None
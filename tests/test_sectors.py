@@ -0,0 +1,49 @@
+import numpy as np
+
+import api
+from index_engine import IndexEngine
+
+
+def sector_members():
+    members = api.INDEX_ENGINE.members("startups")
+    sectors = {}
+    for ticker, shares in members.items():
+        sector = api.TICKER_MAP.get(ticker, {"sector": "Tech"})['sector']
+        sectors.setdefault(sector, {})[ticker] = shares
+    return sectors
+
+
+def test_sectors_match_one_index_per_sector(snapshot, prices):
+    sectors = snapshot['sectors']
+    members = sector_members()
+    assert sectors['names'] == sorted(members)
+    definitions = {name: {"constituents": list(shares), "shares": shares} for name, shares in members.items()}
+    expected = IndexEngine(definitions).build(prices)
+    for j, name in enumerate(sectors['names']):
+        np.testing.assert_allclose(sectors['levels'][:, j], expected.levels[:, expected.ids.index(name)], rtol=1e-9)
+
+
+def test_update_matches_rebuild(prices):
+    engine = api.INDEX_ENGINE
+    previous = engine.build(prices.iloc[:-3])
+    state = engine.update(previous, prices.iloc[-4:])
+    sectors = api.calculate_sectors(state, api.calculate_sectors(previous))
+    full = api.calculate_sectors(engine.build(prices))
+    assert sectors['names'] == full['names']
+    np.testing.assert_allclose(sectors['levels'], full['levels'], rtol=1e-9)
+    np.testing.assert_allclose(sectors['weights'], full['weights'], rtol=1e-9)
+
+
+def test_sectors_route(client, snapshot, prices):
+    start = prices.index[-60].strftime('%Y-%m-%d')
+    data = client.get("/api/startups/sectors?start=%s" % start).get_json()
+    assert data['dates'][0] == start and len(data['dates']) == 60
+    assert abs(sum(s['weight'] for s in data['sectors']) - 100) < 0.1
+    assert sum(s['constituents'] for s in data['sectors']) == len(api.INDEX_ENGINE.members("startups"))
+    # Largest sector first, every series rebased to 100
+    weights = [s['weight'] for s in data['sectors']]
+    assert weights == sorted(weights, reverse=True)
+    levels = snapshot['sectors']['levels'][-60:]
+    for sector in data['sectors']:
+        j = snapshot['sectors']['names'].index(sector['sector'])
+        np.testing.assert_allclose(sector['index'], levels[:, j] / levels[0, j] * 100, atol=0.006)
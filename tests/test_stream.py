@@ -0,0 +1,39 @@
+import json
+
+import api
+
+
+def events(response, count):
+    chunks = iter(response.response)
+    return [next(chunks).decode() for _ in range(count)]
+
+
+def test_snapshot_then_composition(client, prices):
+    start = prices.index[-20].strftime('%Y-%m-%d')
+    response = client.get("/api/startups/stream?start=%s" % start)
+    try:
+        assert response.mimetype == "text/event-stream"
+        retry, snapshot, composition = events(response, 3)
+        assert retry == "retry: 5000\n\n"
+        assert snapshot.startswith("event: snapshot\n")
+        data = json.loads(snapshot.split("data: ", 1)[1])
+        assert data['dates'][0] == start and len(data['dates']) == 20
+        assert composition.startswith("event: composition\n")
+    finally:
+        response.close()
+
+
+def test_slots_are_released(client, prices):
+    free = api.STREAM_SLOTS._value
+    response = client.get("/api/startups/stream?start=%s" % prices.index[-10].strftime('%Y-%m-%d'))
+    assert api.STREAM_SLOTS._value == free - 1
+    response.close()
+    assert api.STREAM_SLOTS._value == free
+
+
+def test_full_slots_answer_503(client, monkeypatch):
+    monkeypatch.setattr(api, "STREAM_SLOTS", api.threading.BoundedSemaphore(1))
+    api.STREAM_SLOTS.acquire()
+    response = client.get("/api/startups/stream")
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
@@ -0,0 +1,45 @@
+import numpy as np
+
+import api
+from index_engine import IndexEngine
+
+
+def fresh_levels(prices, excluded):
+    kept = {t: s for t, s in api.INDEX_ENGINE.members("startups").items() if t not in excluded}
+    return IndexEngine({"startups": {"constituents": list(kept), "shares": kept}}).build(prices).levels[:, 0], kept
+
+
+def test_subset_matches_fresh_engine(snapshot, prices):
+    excluded = list(api.INDEX_ENGINE.members("startups"))[:3]
+    expected, _ = fresh_levels(prices, excluded)
+    np.testing.assert_allclose(api.subset_market_cap(snapshot, frozenset(excluded)), expected, rtol=1e-9)
+    # Most names dropped: summed from the kept side instead
+    excluded = list(api.INDEX_ENGINE.members("startups"))[3:]
+    expected, _ = fresh_levels(prices, excluded)
+    np.testing.assert_allclose(api.subset_market_cap(snapshot, frozenset(excluded)), expected, rtol=1e-9)
+
+
+def test_exclude_and_include_routes(client, prices):
+    excluded = list(api.INDEX_ENGINE.members("startups"))[:3]
+    expected, kept = fresh_levels(prices, excluded)
+    expected = expected[-30:] / expected[-30] * 100
+    start = prices.index[-30].strftime('%Y-%m-%d')
+    short = ",".join(t.split(".")[0].lower() for t in excluded)
+    excluding = client.get("/api/startups/chart?start=%s&exclude=%s" % (start, short)).get_json()
+    including = client.get("/api/startups/chart?start=%s&include=%s" % (start, ",".join(kept))).get_json()
+    np.testing.assert_allclose(excluding['startup_index'], expected, rtol=1e-9)
+    np.testing.assert_allclose(including['startup_index'], expected, rtol=1e-9)
+
+
+def test_subset_parameter_errors(client):
+    assert client.get("/api/startups/chart?exclude=").status_code == 400
+    assert client.get("/api/startups/chart?include=,").status_code == 400
+    assert client.get("/api/startups/chart?exclude=NOPE").status_code == 400
+    assert client.get("/api/startups/chart?exclude=PAYTM&include=NYKAA").status_code == 400
+
+
+def test_subsets_are_cached_per_generation(snapshot):
+    excluded = frozenset(list(api.INDEX_ENGINE.members("startups"))[:2])
+    first = api.subset_market_cap(snapshot, excluded)
+    assert api.subset_market_cap(snapshot, excluded) is first
+    assert (snapshot['generation'], excluded) in api._SUBSET_CACHE
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from providers import PriceProvider
+from upstream import CircuitBreaker, TokenBucket, UpstreamClient, UpstreamUnavailable
+
+
+class FlakyProvider(PriceProvider):
+    name = "flaky"
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def download(self, tickers, start, end):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("down")
+        return {"Close": tickers}
+
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=100, capacity=5)
+    assert all(bucket.acquire() for _ in range(5))
+    assert not bucket.acquire(timeout=0)
+    started = time.monotonic()
+    assert bucket.acquire(timeout=1)
+    assert time.monotonic() - started < 0.5
+
+
+def test_token_bucket_gives_up_after_timeout():
+    bucket = TokenBucket(rate=1, capacity=1)
+    assert bucket.acquire()
+    assert not bucket.acquire(timeout=0.05)
+
+
+def test_circuit_opens_and_half_opens():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0.05)
+    breaker.failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+    assert breaker.retry_after >= 1
+
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    # Only one trial call at a time
+    assert not breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.retry_after == 0
+
+
+def test_client_retries_then_succeeds():
+    provider = FlakyProvider(failures=2)
+    client = UpstreamClient(provider, rate=1000, burst=100, retries=3, backoff=0.001, threshold=5)
+    assert client.download(["A"], None, None) == {"Close": ["A"]}
+    assert provider.calls == 3 and client.healthy
+
+
+def test_client_stops_calling_while_open():
+    provider = FlakyProvider(failures=10)
+    client = UpstreamClient(provider, rate=1000, burst=100, retries=1, backoff=0.001, threshold=2, reset_timeout=60)
+    with pytest.raises(ConnectionError):
+        client.download(["A"], None, None)
+    with pytest.raises(UpstreamUnavailable):
+        client.download(["A"], None, None)
+    assert provider.calls == 2 and not client.healthy
+
+
+def test_budget_refused_trial_gives_the_slot_back():
+    provider = FlakyProvider(failures=1)
+    client = UpstreamClient(provider, rate=0.001, burst=3, retries=0, threshold=1, reset_timeout=0.05,
+                            acquire_timeout=0.01)
+    with pytest.raises(ConnectionError):
+        client.download(["A"], None, None)
+    time.sleep(0.06)
+    # Half-open, but three tickers need three tokens and only two are left
+    with pytest.raises(UpstreamUnavailable, match="budget"):
+        client.download(["A", "B", "C"], None, None)
+    assert client.breaker.state == "half-open" and client.breaker.trial is None
+    # The next call that fits the budget is the trial and closes the circuit
+    assert client.download(["A"], None, None) == {"Close": ["A"]}
+    assert client.healthy and provider.calls == 2
@@ -0,0 +1,153 @@
+import logging
+import random
+import threading
+import time
+
+import metrics
+from providers import PriceProvider
+
+log = logging.getLogger(__name__)
+
+# Rate-limit-aware upstream client.
+# Wraps a provider so every call spends tokens from a shared bucket (one per ticker, as
+# Yahoo makes one request per ticker), retries failures with exponential backoff and full
+# jitter, and stops calling upstream for a while after repeated failures (circuit breaker).
+# Callers keep serving what they already have, marked stale, while the circuit is open.
+
+
+class UpstreamUnavailable(Exception):
+    """Raised without calling upstream: the circuit is open or the request budget is spent."""
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1, timeout=None):
+        """Takes `tokens`, waiting for them up to `timeout` seconds; False if they did not come in time."""
+        tokens = min(tokens, self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `reset_timeout` seconds one trial
+    call is let through (half-open) and its outcome closes or re-opens the circuit."""
+
+    def __init__(self, threshold=5, reset_timeout=60):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        # Thread holding the half-open trial slot
+        self.trial = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    @property
+    def retry_after(self):
+        """Seconds until the next trial call, 0 when closed."""
+        with self.lock:
+            if self.opened_at is None:
+                return 0
+            return max(0, int(self.reset_timeout - (time.monotonic() - self.opened_at)) + 1)
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial is not None:
+                return False
+            self.trial = threading.get_ident()
+            return True
+
+    def release(self):
+        """Gives back this thread's trial slot when the allowed call was never made."""
+        with self.lock:
+            if self.trial == threading.get_ident():
+                self.trial = None
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = None
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial is not None or self.failures >= self.threshold:
+                if self.opened_at is None or self.trial is not None:
+                    log.warning("Upstream circuit opened after %d failures", self.failures)
+                    metrics.UPSTREAM_CIRCUIT_OPENS.inc()
+                self.opened_at = time.monotonic()
+                self.trial = None
+
+
+class UpstreamClient(PriceProvider):
+    def __init__(self, provider, rate=5.0, burst=50, retries=3, backoff=0.5, max_backoff=8.0,
+                 threshold=5, reset_timeout=60, acquire_timeout=10.0):
+        self.provider = provider
+        self.name = provider.name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(threshold, reset_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.acquire_timeout = acquire_timeout
+
+    @property
+    def healthy(self):
+        return self.breaker.state == "closed"
+
+    def _call(self, fn, tickers, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise UpstreamUnavailable("upstream circuit is open")
+            if not self.bucket.acquire(len(tickers), timeout=self.acquire_timeout):
+                # Upstream was not called, so a half-open trial has nothing to report
+                self.breaker.release()
+                raise UpstreamUnavailable("upstream request budget exhausted")
+            try:
+                result = fn(tickers, *args, **kwargs)
+            except Exception as e:
+                self.breaker.failure()
+                if attempt == self.retries:
+                    raise
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                log.info("Upstream call failed (%s), retrying in %.1fs", e, delay)
+                metrics.UPSTREAM_RETRIES.inc(provider=self.name)
+                time.sleep(delay)
+            else:
+                self.breaker.success()
+                return result
+
+    def download(self, tickers, start, end):
+        return self._call(self.provider.download, list(tickers), start, end)
+
+    def intraday(self, tickers, *args, **kwargs):
+        return self._call(self.provider.intraday, list(tickers), *args, **kwargs)